@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Benchmarks for sphinx-testing
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measures the hot paths of sphinx-testing against ``tests/examples`` and
+    synthetic roots (see :mod:`sphinx_testing.generator`), and stores the
+    results to ``benchmarks/results/<revision>.json`` to compare successive
+    versions::
+
+        $ python benchmarks/run.py
+        $ python benchmarks/run.py --compare results/OLD.json results/NEW.json
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from collections import OrderedDict
+from statistics import median
+from time import perf_counter, strftime
+
+import sphinx
+from sphinx_testing.generator import generate_root
+from sphinx_testing.path import path
+from sphinx_testing.tmpdir import mkdtemp
+from sphinx_testing.util import TestApp, docutils_namespace, with_app
+
+BENCHMARKS_DIR = path(__file__).abspath().dirname()
+EXAMPLES_DIR = BENCHMARKS_DIR.parent / 'tests' / 'examples'
+
+#: number of documents of the enlarged roots
+DEFAULT_SIZES = (10, 1000, 10000)
+
+
+def make_root(tmpdir, size):
+    """
+    Makes an enlarged root having `size` documents under `tmpdir`.
+    """
+    root = tmpdir / ('root%d' % size)
+    generate_root(root, documents=size, depth=3, xrefs=2,
+                  images=size // 100, autodoc=size // 100, seed=0)
+    return root
+
+
+def measure(func, repeat):
+    """
+    Calls `func` `repeat` times and returns the elapsed times.  If `func`
+    returns a number, it is used as the elapsed time instead.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        elapsed = func()
+        if elapsed is None:
+            elapsed = perf_counter() - started
+        timings.append(elapsed)
+    return timings
+
+
+def phase_of(phase, **sphinxkwargs):
+    """
+    Returns a function measuring `phase` of TestApp timings.
+    """
+    def bench():
+        with docutils_namespace():
+            app = TestApp(**sphinxkwargs)
+            try:
+                if phase in ('build', 'cleanup'):
+                    app.build()
+            finally:
+                app.cleanup()
+        return app.timings[phase]
+    return bench
+
+
+def build_with_app(srcdir, buildername):
+    @with_app(srcdir=srcdir, buildername=buildername, build_cache=False)
+    def bench(app, status, warning):
+        app.build()
+    return bench
+
+
+def path_operations(srcdir):
+    def bench():
+        tmpdir = mkdtemp()
+        try:
+            srcdir.copytree(tmpdir / 'copy')
+            srcdir.clonetree(tmpdir / 'clone')
+            for name in (tmpdir / 'copy').listdir():
+                filename = tmpdir / 'copy' / name
+                filename.write_bytes(filename.read_bytes(), append=True)
+                filename.isfile()
+                filename.exists()
+        finally:
+            tmpdir.rmtree()
+    return bench
+
+
+def benchmarks(roots):
+    """
+    Yields names and functions of the benchmarks for `roots`.
+    """
+    yield 'create_new_srcdir', phase_of('create_srcdir',
+                                        create_new_srcdir=True)
+    for name, srcdir in roots.items():
+        yield ('%s:init' % name, phase_of('init', srcdir=srcdir))
+        yield ('%s:copy_srcdir' % name,
+               phase_of('copy_srcdir', srcdir=srcdir,
+                        copy_srcdir_to_tmpdir=True))
+        yield ('%s:clone_srcdir' % name,
+               phase_of('copy_srcdir', srcdir=srcdir,
+                        copy_srcdir_to_tmpdir='clone'))
+        yield ('%s:build_html' % name, build_with_app(srcdir, 'html'))
+        yield ('%s:build_text' % name, build_with_app(srcdir, 'text'))
+        yield ('%s:cleanup' % name,
+               phase_of('cleanup', srcdir=srcdir, build_cache=False))
+        yield ('%s:path' % name, path_operations(srcdir))
+
+
+def revision():
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', '--short',
+                                          'HEAD'], cwd=BENCHMARKS_DIR,
+                                         stderr=subprocess.DEVNULL)
+        return output.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(sizes, repeat, pattern=None):
+    tmpdir = mkdtemp()
+    try:
+        roots = OrderedDict(examples=EXAMPLES_DIR)
+        for size in sizes:
+            roots['root%d' % size] = make_root(tmpdir, size)
+
+        results = OrderedDict()
+        for name, func in benchmarks(roots):
+            if pattern and pattern not in name:
+                continue
+
+            timings = measure(func, repeat)
+            results[name] = OrderedDict([('min', min(timings)),
+                                         ('median', median(timings)),
+                                         ('repeat', repeat)])
+            print('%-32s %10.4fs (median: %.4fs)' %
+                  (name, min(timings), median(timings)))
+    finally:
+        tmpdir.rmtree()
+
+    return OrderedDict([('revision', revision()),
+                        ('date', strftime('%Y-%m-%dT%H:%M:%S')),
+                        ('python', platform.python_version()),
+                        ('sphinx', sphinx.__version__),
+                        ('results', results)])
+
+
+def compare(old, new):
+    """
+    Prints the ratios of the results in `new` to `old`.
+    """
+    with open(old) as f:
+        old = json.load(f)
+    with open(new) as f:
+        new = json.load(f)
+
+    print('%-32s %10s %10s %8s' % ('benchmark', old['revision'],
+                                   new['revision'], 'ratio'))
+    for name, result in new['results'].items():
+        if name in old['results']:
+            before = old['results'][name]['min']
+            after = result['min']
+            print('%-32s %9.4fs %9.4fs %7.2fx' %
+                  (name, before, after, after / before if before else 0))
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-s', '--sizes', default=','.join(map(str,
+                                                              DEFAULT_SIZES)),
+                        help='document counts of the enlarged roots')
+    parser.add_argument('-k', dest='pattern',
+                        help='run only benchmarks matching the pattern')
+    parser.add_argument('-o', '--output', default=BENCHMARKS_DIR / 'results',
+                        help='directory to store the results')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two results and exit')
+    options = parser.parse_args(argv)
+
+    if options.compare:
+        compare(*options.compare)
+        return 0
+
+    sizes = [int(size) for size in options.sizes.split(',') if size]
+    report = run(sizes, options.repeat, options.pattern)
+
+    if not os.path.isdir(options.output):
+        os.makedirs(options.output)
+    filename = os.path.join(options.output, '%s.json' % report['revision'])
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('results are stored to %s' % filename)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
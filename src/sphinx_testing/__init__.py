@@ -7,5 +7,34 @@
     :license: BSD, see LICENSE for details.
 """
 
+import sys
+
 from sphinx_testing.tmpdir import mkdtemp, with_tmpdir  # NOQA: import for exporting
-from sphinx_testing.util import TestApp, with_app  # NOQA: import for exporting
+
+__all__ = ['TestApp', 'mkdtemp', 'with_app', 'with_tmpdir']
+
+#: attributes imported from submodules on the first access; they are loaded
+#: lazily not to import Sphinx until needed
+LAZY_ATTRIBUTES = {
+    'TestApp': 'sphinx_testing.util',
+    'with_app': 'sphinx_testing.util',
+}
+
+
+if sys.version_info < (3, 7):
+    # workaround for python 3.6 and older versions (no module __getattr__)
+    from sphinx_testing.util import TestApp, with_app  # NOQA: import for exporting
+else:
+    def __getattr__(name):
+        if name in LAZY_ATTRIBUTES:
+            from importlib import import_module
+            module = import_module(LAZY_ATTRIBUTES[name])
+            value = getattr(module, name)
+            globals()[name] = value  # cache for next access
+            return value
+
+        raise AttributeError('module %r has no attribute %r' %
+                             (__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(LAZY_ATTRIBUTES))
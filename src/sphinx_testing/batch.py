@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+    Batch builds
+    ~~~~~~~~~~~~
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import pickle
+import shutil
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+
+from sphinx_testing.path import path
+from sphinx_testing.util import TestApp, docutils_namespace
+
+
+class BuildResult(object):
+    """
+    A result of the build run by :func:`run_builds`.
+
+    The build trees are kept after the successful build for assertions;
+    call :meth:`cleanup` to remove them.
+    """
+
+    def __init__(self, status='', warning='', outdir=None, exception=None,
+                 traceback=None, cleanup_trees=()):
+        self.status = status
+        self.warning = warning
+        self.outdir = outdir
+        self.exception = exception
+        self.traceback = traceback
+        self.cleanup_trees = list(cleanup_trees)
+
+    def __repr__(self):
+        classname = self.__class__.__name__
+        return '<%s outdir=%r exception=%r>' % (classname, self.outdir,
+                                                self.exception)
+
+    def cleanup(self):
+        for tree in self.cleanup_trees:
+            shutil.rmtree(tree, True)
+
+
+def build_app(sphinxkwargs):
+    """
+    Makes a TestApp with `sphinxkwargs`, builds it and returns
+    a :class:`BuildResult`.  Exceptions are captured into the result.
+    """
+    app = None
+    result = BuildResult()
+    status = StringIO()
+    warning = StringIO()
+    sphinxkwargs = dict(sphinxkwargs, status=status, warning=warning)
+    with docutils_namespace():
+        try:
+            app = TestApp(**sphinxkwargs)
+            result.outdir = path(app.outdir)
+            app.build()
+        except Exception as exc:
+            result.exception = exc
+            result.traceback = traceback.format_exc()
+        finally:
+            if app and result.exception:
+                app.cleanup(error=result.exception)
+                if app.cleanup_on_errors is False:
+                    result.cleanup_trees = app.cleanup_trees
+            elif app:
+                # keep build trees; they are removed by BuildResult.cleanup()
+                result.cleanup_trees, app.cleanup_trees = app.cleanup_trees, []
+                app.cleanup()
+
+    result.status = status.getvalue()
+    result.warning = warning.getvalue()
+    try:
+        pickle.dumps(result.exception)
+    except Exception:
+        result.exception = RuntimeError(repr(result.exception))
+
+    return result
+
+
+def run_builds(argsets, max_workers=None):
+    """
+    Runs builds of TestApp for each keyword arguments in `argsets` across
+    a process pool, and returns a list of :class:`BuildResult` in order.
+
+    Each build runs in its own docutils namespace in a worker process.
+    `status` and `warning` arguments are not allowed; they are captured into
+    the results.
+    """
+    argsets = list(argsets)
+    for sphinxkwargs in argsets:
+        assert 'status' not in sphinxkwargs, 'status is captured to results'
+        assert 'warning' not in sphinxkwargs, 'warning is captured to results'
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(build_app, argsets))
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+    Build cache
+    ~~~~~~~~~~~
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import pickle
+import shutil
+import hashlib
+from pathlib import PurePath
+
+from sphinx import __version__ as sphinx_version
+from sphinx_testing.path import path, _reflink
+from sphinx_testing.tmpdir import tree_size
+
+#: the name of the pickled environment in doctreedir
+ENV_PICKLE_FILENAME = 'environment.pickle'
+
+#: default maximum size of the build cache in bytes
+DEFAULT_MAXSIZE = 512 * 1024 * 1024
+
+#: directories not considered as a part of the source tree
+IGNORED_DIRS = ('_build', '__pycache__')
+
+
+def tree_digest(root):
+    """
+    Returns a hex digest of the names and contents of files in `root`.
+    """
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+        for filename in sorted(filenames):
+            filename = os.path.join(dirpath, filename)
+            relpath = os.path.relpath(filename, root)
+            digest.update(relpath.encode('utf-8', 'surrogateescape'))
+            digest.update(b'\0')
+            with open(filename, 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    digest.update(chunk)
+            digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+def _copyfile(src, dst):
+    try:
+        _reflink(src, dst)
+    except (IOError, OSError):
+        shutil.copy2(src, dst)
+
+
+def _copy_contents(src, dst):
+    """
+    Copies the entries in `src` directory into `dst` directory.
+    """
+    for name in os.listdir(src):
+        srcname = os.path.join(src, name)
+        dstname = os.path.join(dst, name)
+        if os.path.isdir(srcname):
+            shutil.copytree(srcname, dstname, copy_function=_copyfile)
+        else:
+            _copyfile(srcname, dstname)
+
+
+def _relocate(obj, old, new, depth=4, memo=None):
+    """
+    Replaces the path prefix `old` in `obj` with `new`.  Containers and
+    attributes of objects are updated in place up to `depth` levels.
+    """
+    if memo is None:
+        memo = set()
+
+    if isinstance(obj, (str, PurePath)):
+        filename = str(obj)
+        if filename == old or filename.startswith(old + os.sep):
+            return obj.__class__(new + filename[len(old):])
+        return obj
+    elif depth == 0 or id(obj) in memo:
+        return obj
+
+    memo.add(id(obj))
+    if isinstance(obj, dict):
+        items = [(_relocate(k, old, new, depth - 1, memo),
+                  _relocate(v, old, new, depth - 1, memo))
+                 for k, v in obj.items()]
+        obj.clear()
+        obj.update(items)
+    elif isinstance(obj, (list, set)):
+        items = [_relocate(v, old, new, depth - 1, memo) for v in obj]
+        if isinstance(obj, list):
+            obj[:] = items
+        else:
+            obj.clear()
+            obj.update(items)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        for name, value in list(vars(obj).items()):
+            relocated = _relocate(value, old, new, depth - 1, memo)
+            if relocated is not value:
+                setattr(obj, name, relocated)
+
+    return obj
+
+
+class BuildCache(object):
+    """
+    A persistent on-disk cache of build results.  Entries are keyed by the
+    content of the source tree, conf overrides, buildername and the version
+    of Sphinx, and hold the doctrees (including the pickled environment),
+    the output tree and the warnings emitted on the build.
+
+    The least recently used entries are removed when the total size of the
+    cache exceeds `maxsize` bytes.
+
+    .. warning:: Only the files in srcdir (and confdir) are part of the key.
+                 The code of extensions and the modules documented by
+                 autodoc outside srcdir are not; a stale result is restored
+                 after they change.  Do not enable the cache (e.g. by
+                 ``$SPHINX_TESTING_BUILD_CACHE``) for tests of the code under
+                 development, or clear the cache when it changes.
+    """
+
+    def __init__(self, cachedir=None, maxsize=DEFAULT_MAXSIZE):
+        if cachedir is None:
+            cachedir = default_cachedir()
+        self.cachedir = path(cachedir)
+        self.maxsize = maxsize
+
+    def make_key(self, srcdir, buildername, confoverrides=None, tags=None,
+                 confdir=None, verbosity=0):
+        """
+        Returns the key of the build for the given arguments.  The verbosity
+        is a part of the key as it changes the warnings emitted.
+        """
+        digest = hashlib.sha256()
+        digest.update(tree_digest(srcdir).encode())
+        if confdir and path(confdir).abspath() != path(srcdir).abspath():
+            digest.update(tree_digest(confdir).encode())
+        overrides = (confoverrides or {}).items()
+        params = (buildername, sorted((k, repr(v)) for k, v in overrides),
+                  sorted(tags or []), verbosity, sphinx_version,
+                  sys.version_info[:2])
+        digest.update(repr(params).encode('utf-8'))
+        return digest.hexdigest()
+
+    def restore(self, key, srcdir, outdir, doctreedir):
+        """
+        Restores the build result for `key` to `outdir` and `doctreedir`.
+        Returns the warnings of the build (with the paths relocated to
+        `srcdir`), or ``None`` if not cached.
+        """
+        entry = self.cachedir / key
+        if not entry.isdir():
+            return None
+
+        try:
+            _copy_contents(entry / 'doctrees', doctreedir)
+            _copy_contents(entry / 'output', outdir)
+
+            warnings = (entry / 'warnings.txt').read_bytes().decode('utf-8')
+            origin = (entry / 'srcdir.txt').read_bytes().decode('utf-8')
+            if origin != srcdir:
+                self.relocate_env(doctreedir, origin, srcdir)
+                warnings = warnings.replace(origin + os.sep, srcdir + os.sep)
+
+            os.utime(entry, None)  # mark as recently used
+            return warnings
+        except (IOError, OSError, pickle.PickleError):
+            # broken entry; rebuild it
+            for tree in (outdir, doctreedir):
+                shutil.rmtree(tree, True)
+                os.makedirs(tree)
+            shutil.rmtree(entry, True)
+            return None
+
+    def relocate_env(self, doctreedir, old, new):
+        """
+        Rewrites the source directory recorded in the pickled environment.
+        """
+        filename = os.path.join(doctreedir, ENV_PICKLE_FILENAME)
+        with open(filename, 'rb') as f:
+            env = pickle.load(f)
+        _relocate(env, str(old), str(new))
+        with open(filename, 'wb') as f:
+            pickle.dump(env, f, pickle.HIGHEST_PROTOCOL)
+
+    def store(self, key, srcdir, outdir, doctreedir, warnings):
+        """
+        Stores the build result in `outdir` and `doctreedir` as `key`.
+        """
+        entry = self.cachedir / key
+        if entry.exists():
+            return
+
+        tmpdir = self.cachedir / ('%s.%d.tmp' % (key, os.getpid()))
+        try:
+            shutil.copytree(doctreedir, tmpdir / 'doctrees',
+                            copy_function=_copyfile)
+            shutil.copytree(outdir, tmpdir / 'output',
+                            copy_function=_copyfile)
+            (tmpdir / 'srcdir.txt').write_bytes(srcdir.encode('utf-8'))
+            (tmpdir / 'warnings.txt').write_bytes(warnings.encode('utf-8'))
+            (tmpdir / 'size.txt').write_text(str(tree_size(tmpdir)))
+            os.rename(tmpdir, entry)
+        except OSError:
+            pass  # stored by another process
+        finally:
+            shutil.rmtree(tmpdir, True)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the total size of the
+        cache fits in `maxsize`.
+        """
+        entries = []
+        for name in os.listdir(self.cachedir):
+            entry = self.cachedir / name
+            try:
+                size = int((entry / 'size.txt').read_bytes())
+                entries.append((os.stat(entry).st_mtime, size, entry))
+            except (IOError, OSError, ValueError):
+                pass  # incomplete entry
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.maxsize:
+                break
+            shutil.rmtree(entry, True)
+            total -= size
+
+    def clear(self):
+        """
+        Removes all entries of the cache.
+        """
+        shutil.rmtree(self.cachedir, True)
+
+
+def default_cachedir():
+    """
+    Returns the directory of the build cache; ``$SPHINX_TESTING_BUILD_CACHE``
+    or ``sphinx-testing`` directory under the user cache directory.
+    """
+    cachedir = os.environ.get('SPHINX_TESTING_BUILD_CACHE')
+    if cachedir:
+        return path(cachedir)
+
+    cachehome = os.environ.get('XDG_CACHE_HOME')
+    if not cachehome:
+        cachehome = os.path.join(os.path.expanduser('~'), '.cache')
+    return path(cachehome) / 'sphinx-testing' / 'builds'
+
+
+def get_build_cache(build_cache):
+    """
+    Returns a :class:`BuildCache` for `build_cache` argument of TestApp.
+    If it is ``None``, the cache is enabled when
+    ``$SPHINX_TESTING_BUILD_CACHE`` is set; note that the key does not cover
+    the extensions and autodoc targets outside srcdir (see BuildCache).
+    """
+    if build_cache is None:
+        build_cache = bool(os.environ.get('SPHINX_TESTING_BUILD_CACHE'))
+
+    if build_cache is True:
+        build_cache = BuildCache()
+    elif build_cache is False:
+        return None
+
+    try:
+        build_cache.cachedir.makedirs()
+    except OSError:
+        pass  # already exists
+    return build_cache
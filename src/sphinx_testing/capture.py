@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+    Capture of status and warning streams
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import io
+import os
+import re
+from collections import deque, namedtuple
+from tempfile import SpooledTemporaryFile
+
+#: default number of lines kept by :class:`RingBuffer`
+DEFAULT_MAXLINES = 10000
+
+#: default size of :class:`SpoolBuffer` kept in memory (in bytes)
+DEFAULT_SPOOL_SIZE = 1024 * 1024
+
+color_re = re.compile('\x1b\\[[0-9;]*m')
+warning_re = re.compile(r'^(?:(?P<location>.*?): )?'
+                        r'(?P<level>WARNING|ERROR|SEVERE|CRITICAL): '
+                        r'(?P<message>.*?)'
+                        r'(?: \[(?P<type>[\w-]+)'
+                        r'(?:\.(?P<subtype>[\w.-]+))?\])?$')
+type_re = re.compile(r'^(?P<message>.*?) ?\[(?P<type>[\w-]+)'
+                     r'(?:\.(?P<subtype>[\w.-]+))?\]$')
+lineno_re = re.compile(r'^(?P<filename>.*?):(?P<lineno>\d+)$')
+
+WarningRecord = namedtuple('WarningRecord', ['docname', 'lineno', 'level',
+                                             'type', 'subtype', 'message',
+                                             'location', 'text'])
+
+
+class LineBuffer(io.TextIOBase):
+    """
+    Base class of the capture streams.  It splits written text into lines
+    and passes each line to :meth:`writeline`.
+    """
+
+    def __init__(self):
+        self._partial = ''
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return False
+
+    def write(self, text):
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self.writeline(line + '\n')
+        return len(text)
+
+    def writeline(self, line):
+        raise NotImplementedError
+
+    def getvalue(self):
+        raise NotImplementedError
+
+
+class RingBuffer(LineBuffer):
+    """
+    A stream keeping only the last `maxlines` lines of the output.
+    """
+
+    def __init__(self, maxlines=DEFAULT_MAXLINES):
+        super().__init__()
+        self.lines = deque(maxlen=maxlines)
+
+    def writeline(self, line):
+        self.lines.append(line)
+
+    def truncate(self, size=None):
+        self.lines.clear()
+        self._partial = ''
+
+    def getvalue(self):
+        return ''.join(self.lines) + self._partial
+
+
+class SpoolBuffer(io.TextIOBase):
+    """
+    A stream keeping the whole output in memory up to `max_size` bytes and
+    spilling it to a temporary file beyond that.
+    """
+
+    def __init__(self, max_size=DEFAULT_SPOOL_SIZE):
+        self._file = SpooledTemporaryFile(max_size, mode='w+',
+                                          encoding='utf-8')
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return False
+
+    def write(self, text):
+        return self._file.write(text)
+
+    def truncate(self, size=None):
+        self._file.seek(0)
+        self._file.truncate()
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+    @property
+    def spilled(self):
+        """
+        ``True`` if the output has been spilled to a file.
+        """
+        return self._file._rolled
+
+    def getvalue(self):
+        position = self._file.tell()
+        try:
+            self._file.seek(0)
+            return self._file.read()
+        finally:
+            self._file.seek(position)
+
+
+class WarningLog(LineBuffer):
+    """
+    A stream parsing warnings into :class:`WarningRecord` as they are
+    emitted.  The records are indexed by docname and type; the lines not
+    looking like a warning are appended to the previous record.
+    """
+
+    def __init__(self, srcdir=None):
+        super().__init__()
+        self.records = []
+        self._by_docname = {}
+        self._by_type = {}
+        self._srcdirs = ()
+        if srcdir:
+            self.set_srcdir(srcdir)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def set_srcdir(self, srcdir):
+        """
+        Sets the source directory to determine docnames of warnings.
+        """
+        srcdirs = {os.path.abspath(srcdir), os.path.realpath(srcdir)}
+        self._srcdirs = tuple(d + os.sep for d in srcdirs)
+
+    def docname_for(self, filename):
+        for srcdir in self._srcdirs:
+            if filename.startswith(srcdir):
+                relpath = filename[len(srcdir):]
+                return os.path.splitext(relpath)[0].replace(os.sep, '/')
+
+        return None
+
+    def writeline(self, line):
+        text = color_re.sub('', line)
+        matched = warning_re.match(text.rstrip('\n'))
+        if matched is None:
+            if self.records:  # continuation of the previous warning
+                self._continue(text)
+            else:
+                self.records.append(WarningRecord(None, None, None, None,
+                                                  None, text.rstrip('\n'),
+                                                  None, text))
+            return
+
+        location = matched.group('location')
+        docname = lineno = None
+        if location:
+            filename = location
+            with_lineno = lineno_re.match(location)
+            if with_lineno:
+                filename = with_lineno.group('filename')
+                lineno = int(with_lineno.group('lineno'))
+            docname = self.docname_for(filename)
+
+        record = WarningRecord(docname, lineno, matched.group('level'),
+                               matched.group('type'),
+                               matched.group('subtype'),
+                               matched.group('message'), location, text)
+        index = len(self.records)
+        self.records.append(record)
+        self._by_docname.setdefault(docname, []).append(index)
+        self._by_type.setdefault(record.type, []).append(index)
+
+    def _continue(self, text):
+        """
+        Appends `text` to the last record.  The ``[type.subtype]`` suffix of
+        multi-line warnings is placed on their last line.
+        """
+        index = len(self.records) - 1
+        record = self.records[index]
+        lines = (record.text + text).rstrip('\n').split('\n')
+        first = warning_re.match(lines[0])
+        if first is None:  # not a warning; lines before the first one
+            self.records[index] = record._replace(
+                message=record.message + '\n' + text.rstrip('\n'),
+                text=record.text + text)
+            return
+
+        type, subtype = first.group('type'), first.group('subtype')
+        suffix = type_re.match(lines[-1])
+        if suffix:
+            type, subtype = suffix.group('type'), suffix.group('subtype')
+            lines[-1] = suffix.group('message')
+        message = '\n'.join([first.group('message')] + lines[1:])
+
+        if type != record.type:
+            self._by_type[record.type].remove(index)
+            self._by_type.setdefault(type, []).append(index)
+        self.records[index] = record._replace(type=type, subtype=subtype,
+                                              message=message,
+                                              text=record.text + text)
+
+    def truncate(self, size=None):
+        self.records = []
+        self._by_docname.clear()
+        self._by_type.clear()
+        self._partial = ''
+
+    def getvalue(self):
+        return ''.join(record.text for record in self.records) + self._partial
+
+    def for_doc(self, docname):
+        """
+        Returns the warnings for the document `docname`.
+        """
+        return [self.records[i] for i in self._by_docname.get(docname, [])]
+
+    def for_type(self, type, subtype=None):
+        """
+        Returns the warnings of the `type` (and `subtype` if given).
+        """
+        records = [self.records[i] for i in self._by_type.get(type, [])]
+        if subtype is not None:
+            records = [r for r in records if r.subtype == subtype]
+        return records
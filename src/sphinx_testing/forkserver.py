@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+    Fork server for isolated builds
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import gc
+import os
+import pickle
+import socket
+import struct
+import threading
+from importlib import import_module
+
+from sphinx_testing.batch import BuildResult, build_app
+
+HEADER = struct.Struct('!Q')
+
+
+def send_message(sock, obj):
+    data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    def recv(size):
+        chunks = []
+        while size > 0:
+            chunk = sock.recv(min(size, 1024 * 1024))
+            if not chunk:
+                raise EOFError('connection closed')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    size, = HEADER.unpack(recv(HEADER.size))
+    return pickle.loads(recv(size))
+
+
+class ForkServer(object):
+    """
+    A server process which imports Sphinx and the given `extensions` once and
+    forks a child process per build.  Builds are fully isolated from each
+    other and from the calling process, at near-zero startup cost.
+
+    The server is forked from the current process on :meth:`start`; start it
+    before creating threads.  Only available on platforms supporting
+    :func:`os.fork`.
+    """
+
+    def __init__(self, extensions=()):
+        self.extensions = list(extensions)
+        self.pid = None
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        if not hasattr(os, 'fork'):
+            raise NotImplementedError('ForkServer requires os.fork()')
+        if self.pid:
+            return
+
+        sock, server_sock = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            try:
+                self.serve(server_sock)
+            finally:
+                os._exit(0)
+
+        server_sock.close()
+        self.pid = pid
+        self._sock = sock
+
+    def stop(self):
+        if self.pid is None:
+            return
+
+        try:
+            send_message(self._sock, None)
+        except OSError:
+            pass  # server has gone
+        self._sock.close()
+        os.waitpid(self.pid, 0)
+        self.pid = None
+        self._sock = None
+
+    def serve(self, sock):
+        """
+        The main loop of the server process.
+        """
+        import sphinx.application  # NOQA: preload
+        for extension in self.extensions:
+            import_module(extension)
+        if hasattr(gc, 'freeze'):  # python 3.7+
+            gc.freeze()  # keep preloaded objects away from GC of children
+
+        while True:
+            sphinxkwargs = recv_message(sock)
+            if sphinxkwargs is None:
+                break
+
+            pid = os.fork()
+            if pid == 0:
+                # exit with non-zero status if the result is not sent (e.g.
+                # KeyboardInterrupt raised in the build)
+                exitcode = 1
+                try:
+                    send_message(sock, build_app(sphinxkwargs))
+                    exitcode = 0
+                finally:
+                    os._exit(exitcode)
+
+            _, status = os.waitpid(pid, 0)
+            if status != 0:
+                error = RuntimeError('build process exited with status %d' %
+                                     status)
+                send_message(sock, BuildResult(exception=error))
+
+    def run(self, **sphinxkwargs):
+        """
+        Builds a TestApp with `sphinxkwargs` in a forked child process and
+        returns a :class:`~sphinx_testing.batch.BuildResult`.
+        """
+        assert 'status' not in sphinxkwargs, 'status is captured to results'
+        assert 'warning' not in sphinxkwargs, 'warning is captured to results'
+
+        with self._lock:
+            self.start()
+            send_message(self._sock, sphinxkwargs)
+            return recv_message(self._sock)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+    Synthetic projects
+    ~~~~~~~~~~~~~~~~~~
+
+    Generates deterministic projects of any size for scale testing::
+
+        spec = generate_spec(documents=1000, seed=1)
+        app = TestApp(create_new_srcdir=spec)
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import math
+import random
+import hashlib
+import struct
+import zlib
+
+from sphinx_testing.spec import flatten_spec, write_tree
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua').split()
+
+#: the prefix of the name of the module documented by autodoc; it is
+#: followed by the digest of the generator arguments not to reuse the module
+#: of another root imported in the same process
+AUTODOC_MODULE = 'synthetic'
+
+CONF_TEMPLATE = '''\
+import os
+import sys
+sys.path.insert(0, os.path.abspath('.'))
+
+project = 'synthetic'
+master_doc = 'index'
+extensions = %r
+'''
+
+
+def make_png(rgb):
+    """
+    Returns a PNG image of a pixel in the color `rgb`.
+    """
+    def chunk(name, data):
+        crc = zlib.crc32(name + data) & 0xffffffff
+        return struct.pack('!I', len(data)) + name + data + struct.pack('!I',
+                                                                        crc)
+
+    header = struct.pack('!IIBBBBB', 1, 1, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(b'\0' + bytes(rgb))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', pixels) + chunk(b'IEND', b''))
+
+
+def paragraph(rng, words=40):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + '.'
+
+
+def generate_spec(documents=100, depth=2, xrefs=2, images=0, autodoc=0,
+                  seed=0):
+    """
+    Returns a tree spec (see :mod:`sphinx_testing.spec`) of a synthetic
+    project.  The same arguments always produce the same spec.
+
+    :param documents: the number of documents except the master document
+    :param depth: the depth of the toctree
+    :param xrefs: the number of cross-references per document
+    :param images: the number of images referred from random documents
+    :param autodoc: the number of functions documented by autodoc
+    :param seed: the seed of the random contents
+    """
+    params = (documents, depth, xrefs, images, autodoc, seed)
+    modname = '%s_%s' % (AUTODOC_MODULE,
+                         hashlib.sha1(repr(params).encode()).hexdigest()[:12])
+    rng = random.Random(seed)
+    docnames = ['doc%05d' % i for i in range(documents)]
+    fanout = max(int(math.ceil(documents ** (1.0 / max(depth, 1)))), 1)
+
+    # the documents are placed in breadth-first order; the children of the
+    # n-th document are the (n * fanout + 1)-th to (n * fanout + fanout)-th
+    children = {'index': docnames[:fanout]}
+    for i, docname in enumerate(docnames):
+        start = (i + 1) * fanout
+        children[docname] = docnames[start:start + fanout]
+
+    bodies = {docname: [] for docname in docnames}
+    for docname in docnames:
+        for _ in range(xrefs):
+            bodies[docname].append(':ref:`%s`' % rng.choice(docnames))
+
+    spec = {}
+    for i in range(images):
+        filename = '_images/image%04d.png' % i
+        spec[filename] = make_png([rng.randrange(256) for _ in range(3)])
+        if docnames:
+            bodies[rng.choice(docnames)].append('.. image:: /%s' % filename)
+
+    extensions = []
+    if autodoc:
+        extensions.append('sphinx.ext.autodoc')
+        functions = []
+        for i in range(autodoc):
+            functions.append('def func%05d(arg, *args, **kwargs):\n'
+                             '    """%s\n\n'
+                             '    :param arg: %s\n'
+                             '    """\n' % (i, paragraph(rng, 10),
+                                            paragraph(rng, 5)))
+            if docnames:
+                bodies[rng.choice(docnames)].append(
+                    '.. autofunction:: %s.func%05d' % (modname, i))
+        spec[modname + '.py'] = '\n\n'.join(functions)
+
+    spec['conf.py'] = CONF_TEMPLATE % extensions
+    for docname in ['index'] + docnames:
+        title = docname.capitalize()
+        lines = ['.. _%s:' % docname, '', title, '=' * len(title), '',
+                 paragraph(rng), '']
+        for body in bodies.get(docname, []):
+            lines += [body, '']
+        if children[docname]:
+            lines += ['.. toctree::', '']
+            lines += ['   %s' % child for child in children[docname]]
+        spec[docname + '.rst'] = '\n'.join(lines) + '\n'
+
+    return spec
+
+
+def generate_root(destination, **options):
+    """
+    Writes a synthetic project into `destination`.  The `options` are passed
+    to :func:`generate_spec`.
+    """
+    write_tree(destination, flatten_spec(generate_spec(**options)))
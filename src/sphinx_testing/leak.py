@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+    Leak detection
+    ~~~~~~~~~~~~~~
+
+    Measures the memory retained after a TestApp is cleaned up::
+
+        app = TestApp(srcdir=srcdir, leak_check=LeakCheck(threshold=2 ** 20))
+        app.build()
+        app.cleanup()  # raises MemoryLeak if more than 1MB is retained
+        print(app.leak_check.report())
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import gc
+import os
+import tracemalloc
+
+#: default number of allocations shown in the report
+DEFAULT_LIMIT = 10
+
+
+class MemoryLeak(AssertionError):
+    """
+    Raised when the retained memory exceeds the threshold of
+    :class:`LeakCheck`.
+    """
+
+
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            break
+        size /= 1024.0
+    else:
+        unit = 'GiB'
+    return '%.1f %s' % (size, unit)
+
+
+class LeakCheck(object):
+    """
+    Compares the snapshots of :mod:`tracemalloc` and the number of objects
+    tracked by :mod:`gc` taken by :meth:`start` and :meth:`stop`.
+
+    :param threshold:
+        If given, :meth:`check` raises :exc:`MemoryLeak` when the retained
+        memory exceeds it (in bytes).
+    :param limit: the number of allocations shown in the report.
+    :param key_type:
+        How the allocations are grouped; ``'lineno'``, ``'filename'`` or
+        ``'traceback'``.
+    """
+
+    def __init__(self, threshold=None, limit=DEFAULT_LIMIT, key_type='lineno'):
+        self.threshold = threshold
+        self.limit = limit
+        self.key_type = key_type
+        self.stats = []
+        self.retained = 0
+        self.objects = 0
+        self._snapshot = None
+        self._objects = 0
+        self._tracing = False
+
+    def take_snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def start(self):
+        """
+        Takes the snapshot before the construction of the app.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+        gc.collect()
+        self._objects = len(gc.get_objects())
+        self._snapshot = self.take_snapshot()
+
+    def stop(self):
+        """
+        Takes the snapshot after the cleanup of the app and compares it with
+        the one taken by :meth:`start`.
+        """
+        if self._snapshot is None:
+            return  # not started
+
+        gc.collect()
+        self.objects = len(gc.get_objects()) - self._objects
+        snapshot = self.take_snapshot()
+        stats = snapshot.compare_to(self._snapshot, self.key_type)
+        self.cancel()
+
+        self.stats = [stat for stat in stats if stat.size_diff > 0]
+        self.retained = sum(stat.size_diff for stat in stats)
+
+    def cancel(self):
+        """
+        Stops tracing (if started by :meth:`start`) without measuring.
+        """
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        self._snapshot = None
+
+    def check(self):
+        """
+        Raises :exc:`MemoryLeak` if the retained memory exceeds the threshold.
+        """
+        if self.threshold is not None and self.retained > self.threshold:
+            raise MemoryLeak(self.report())
+
+    def report(self):
+        """
+        Returns a report of the top allocations retained.
+        """
+        lines = ['retained %s, %+d objects' % (format_size(self.retained),
+                                               self.objects)]
+        for stat in self.stats[:self.limit]:
+            frame = stat.traceback[0]
+            lines.append('    %s:%s: +%s (%+d blocks)' %
+                         (frame.filename, frame.lineno,
+                          format_size(stat.size_diff), stat.count_diff))
+        return '\n'.join(lines)
+
+
+def get_leak_check(leak_check):
+    """
+    Returns a :class:`LeakCheck` for `leak_check` argument of TestApp.  If it
+    is ``None``, the check is enabled when ``$SPHINX_TESTING_LEAK_CHECK`` is
+    set; its value (if a number) is used as the threshold in bytes.
+    """
+    if leak_check is None:
+        threshold = os.environ.get('SPHINX_TESTING_LEAK_CHECK')
+        if threshold is None:
+            return None
+        elif threshold.isdigit():
+            return LeakCheck(int(threshold))
+        else:
+            return LeakCheck()
+    elif leak_check is True:
+        return LeakCheck()
+    elif leak_check is False:
+        return None
+    else:
+        return leak_check
@@ -9,12 +9,105 @@
 """
 import os
 import sys
+import mmap
+import errno
 import shutil
 from codecs import open
+from fnmatch import fnmatch
 
 
 FILESYSTEMENCODING = sys.getfilesystemencoding() or sys.getdefaultencoding()
 
+#: default size of chunks for :meth:`path.iter_bytes`
+CHUNK_SIZE = 64 * 1024
+
+#: files larger than this are mapped to memory by ``read_bytes(view=True)``
+MMAP_THRESHOLD = 1024 * 1024
+
+#: ioctl request number of FICLONE (Linux); used to make reflink copies
+FICLONE = 0x40049409
+
+#: files and directories which Sphinx writes into srcdir by itself (the build
+#: directory and compiled message catalogs); they are copied on
+#: :meth:`path.clonetree` not to be shared with the source tree
+COPIED_PATTERNS = ('_build', '*.mo')
+
+#: root directories created by :meth:`path.clonetree` and
+#: :meth:`path.overlaytree`; files under them are detached from their origin
+#: before being written through :class:`path`
+_cow_roots = set()
+
+
+def _discard_cow_roots(tree):
+    """
+    Forgets the roots of :data:`_cow_roots` in `tree` being removed.
+    """
+    if not _cow_roots:
+        return
+
+    tree = os.path.abspath(tree)
+    for root in list(_cow_roots):
+        if root == tree or root.startswith(tree + os.sep):
+            _cow_roots.discard(root)
+
+
+def _match(name, patterns):
+    """
+    Returns ``True`` if `name` matches any of `patterns`.
+    """
+    if isinstance(patterns, str):
+        patterns = (patterns,)
+    return any(fnmatch(name, pattern) for pattern in patterns)
+
+
+def _reflink(src, dst):
+    """
+    Makes a copy-on-write clone of `src` at `dst` using FICLONE ioctl.
+    Raises :exc:`OSError` if the platform or filesystem does not support it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, 'reflink is not supported', src)
+
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except (IOError, OSError):
+                fdst.close()
+                os.unlink(dst)
+                raise
+    shutil.copystat(src, dst)
+
+
+def _clonefile(src, dst):
+    """
+    Copies a file for :meth:`path.clonetree`.  Tries reflink, hardlink and
+    plain copy in order.
+    """
+    try:
+        _reflink(src, dst)
+        return
+    except (IOError, OSError):
+        pass
+
+    try:
+        os.link(src, dst)
+    except (IOError, OSError):
+        shutil.copy2(src, dst)
+
+
+def _copyfile(src, dst):
+    """
+    Copies a file with reflink if possible.  Unlike :func:`_clonefile`, the
+    copy never shares its data with `src` on writes.
+    """
+    try:
+        _reflink(src, dst)
+    except (IOError, OSError):
+        shutil.copy2(src, dst)
+
 
 class path(str):
     """
@@ -95,6 +188,7 @@ class path(str):
             caused it to fail and `exc_info` is a tuple as returned by
             :func:`sys.exc_info`.
         """
+        _discard_cow_roots(self)
         shutil.rmtree(self, ignore_errors=ignore_errors, onerror=onerror)
 
     def copytree(self, destination, symlinks=False):
@@ -109,6 +203,127 @@ class path(str):
         """
         shutil.copytree(self, destination, symlinks=symlinks)
 
+    def clonetree(self, destination, symlinks=False, copy=COPIED_PATTERNS):
+        """
+        Recursively clone a directory to the given `destination` cheaply.
+
+        Each file is cloned with a reflink where the filesystem supports
+        it, otherwise it is hardlinked to the original.  Files that can be
+        neither reflinked nor hardlinked (e.g. across filesystems) are
+        copied.  Hardlinked files are detached from the original when they
+        are written through :meth:`write_text` or :meth:`write_bytes`, so
+        the source tree is never modified through them.
+
+        .. note:: Writing to hardlinked files by other means (e.g.
+                  :func:`open`) modifies the files of the source tree.
+                  The files Sphinx writes into srcdir by itself are copied
+                  (see `copy`), but others, like the stubs generated by
+                  autosummary, have to be added to `copy`.
+
+        :param symlinks:
+            If ``True`` symbolic links in the source tree result in symbolic
+            links in the destination tree otherwise the contents of the files
+            pointed to by the symbolic links are cloned.
+        :param copy:
+            The files (or the files in the directories) whose name matches
+            the patterns are copied instead of being hardlinked.
+        """
+        source = os.path.abspath(self)
+        destination = self.__class__(destination).abspath()
+
+        def clonefile(src, dst):
+            names = os.path.relpath(src, source).split(os.sep)
+            if any(_match(name, copy) for name in names):
+                _copyfile(src, dst)
+            else:
+                _clonefile(src, dst)
+
+        shutil.copytree(source, destination, symlinks=symlinks,
+                        copy_function=clonefile)
+        _cow_roots.add(destination)
+
+    def overlaytree(self, destination, copy=COPIED_PATTERNS):
+        """
+        Recursively overlay a directory onto the given `destination`.
+
+        The directories are created in `destination`, and each file is
+        a symbolic link to the original.  The links are replaced by real
+        files when they are written through :meth:`write_text` or
+        :meth:`write_bytes`, so the cost is proportional to the files
+        written.  Files are cloned (see :meth:`clonetree`) if symbolic links
+        are not available.
+
+        .. note:: Writing to overlaid files by other means (e.g.
+                  :func:`open`) modifies the files of the source tree.
+                  The files Sphinx writes into srcdir by itself are not
+                  linked (see `copy`), but others, like the stubs generated
+                  by autosummary, have to be added to `copy`.
+
+        :param copy:
+            The directories whose name matches the patterns (e.g. the build
+            directory) are created empty, and the files whose name matches
+            them are copied instead of being linked.
+        """
+        source = os.path.abspath(self)
+        destination = self.__class__(destination).abspath()
+        for dirpath, dirnames, filenames in os.walk(source):
+            reldir = os.path.relpath(dirpath, source)
+            os.makedirs(os.path.join(destination, reldir))
+            for dirname in list(dirnames):
+                if _match(dirname, copy):
+                    dirnames.remove(dirname)
+                    os.makedirs(os.path.join(destination, reldir, dirname))
+                elif os.path.islink(os.path.join(dirpath, dirname)):
+                    # link symlinked directories as is
+                    dirnames.remove(dirname)
+                    filenames.append(dirname)
+            for filename in filenames:
+                src = os.path.join(dirpath, filename)
+                dst = os.path.join(destination, reldir, filename)
+                if _match(filename, copy):
+                    _copyfile(src, dst)
+                    continue
+
+                try:
+                    os.symlink(src, dst)
+                except (AttributeError, NotImplementedError, OSError):
+                    _clonefile(src, dst)
+        _cow_roots.add(destination)
+
+    def _detach(self, keep_content=False):
+        """
+        Breaks the link to the original file if the path is placed in a tree
+        created by :meth:`clonetree` or :meth:`overlaytree`.
+
+        :param keep_content:
+            If ``True`` the content of the file is copied to the detached
+            file.  Otherwise the file is simply removed.
+        """
+        if not _cow_roots:
+            return
+
+        filename = os.path.abspath(self)
+        for root in _cow_roots:
+            if filename.startswith(root + os.sep):
+                break
+        else:
+            return
+
+        try:
+            stat = os.lstat(filename)
+        except OSError:
+            return  # not exists
+
+        if not os.path.islink(filename) and stat.st_nlink < 2:
+            return
+
+        if keep_content:
+            tmpname = filename + '.detach'
+            shutil.copy2(filename, tmpname)
+            os.rename(tmpname, filename)
+        else:
+            os.unlink(filename)
+
     def move(self, destination):
         """
         Recursively move the file or directory to the given `destination`
@@ -134,10 +349,82 @@ class path(str):
     def listdir(self):
         return os.listdir(self)
 
+    def _scan(self, prune=(), recursive=True):
+        """
+        Yields pairs of the relative path (separated by ``/``) and
+        :class:`os.DirEntry` of the entries under the path using
+        :func:`os.scandir`.  Symbolic links to directories are not followed.
+
+        :param prune:
+            Directories whose name or relative path matches the patterns are
+            yielded, but not descended into.
+        """
+        stack = ['']
+        while stack:
+            reldir = stack.pop()
+            # read entries at once not to hold the descriptor while yielding
+            entries = list(os.scandir(os.path.join(self, reldir)))
+            for entry in entries:
+                relpath = reldir + entry.name
+                yield relpath, entry
+
+                if (recursive and entry.is_dir(follow_symlinks=False) and
+                        not _match(entry.name, prune) and
+                        not _match(relpath, prune)):
+                    stack.append(relpath + '/')
+
+    def walk(self, include=None, exclude=None, prune=(), dirs=False):
+        """
+        Iterates over the files under the path recursively.
+
+        :param include:
+            If given, only the files whose relative path matches the pattern
+            (or any of the list of patterns) are yielded.
+        :param exclude:
+            The files whose relative path matches the patterns are skipped.
+        :param prune:
+            Directories whose name or relative path matches the patterns
+            (e.g. ``'_build'``) are not descended into.
+        :param dirs:
+            If ``True`` directories are also yielded.
+        """
+        for relpath, entry in self._scan(prune):
+            if not dirs and entry.is_dir():
+                continue
+            elif include and not _match(relpath, include):
+                continue
+            elif exclude and _match(relpath, exclude):
+                continue
+
+            yield self.__class__(entry.path)
+
+    def glob(self, pattern):
+        """
+        Iterates over the entries in the directory whose name matches the
+        `pattern`.
+        """
+        for _, entry in self._scan(recursive=False):
+            if fnmatch(entry.name, pattern):
+                yield self.__class__(entry.path)
+
+    def rglob(self, pattern, prune=()):
+        """
+        Iterates over the entries under the path recursively whose name
+        matches the `pattern`.
+
+        :param prune:
+            Directories whose name or relative path matches the patterns are
+            not descended into.
+        """
+        for _, entry in self._scan(prune):
+            if fnmatch(entry.name, pattern):
+                yield self.__class__(entry.path)
+
     def write_text(self, text, **kwargs):
         """
         Writes the given `text` to the file.
         """
+        self._detach()
         f = open(self, 'w', **kwargs)
         try:
             f.write(text)
@@ -154,13 +441,46 @@ class path(str):
         finally:
             f.close()
 
-    def read_bytes(self):
+    def iter_lines(self, **kwargs):
+        """
+        Iterates over the lines of text in the file without loading the
+        whole file.
+        """
+        f = open(self, mode='r', **kwargs)
+        try:
+            for line in f:
+                yield line
+        finally:
+            f.close()
+
+    def read_bytes(self, view=False):
         """
         Returns the bytes in the file.
+
+        :param view:
+            If ``True`` and the file is larger than :data:`MMAP_THRESHOLD`,
+            a read-only :class:`mmap.mmap` of the file is returned instead of
+            copying its content.  It supports slicing, ``find()`` and regular
+            expressions like bytes (note that ``in`` operator does not search
+            substrings of mmap).
         """
         f = open(self, mode='rb')
         try:
-            return f.read()
+            if view and os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                return f.read()
+        finally:
+            f.close()
+
+    def iter_bytes(self, chunk_size=CHUNK_SIZE):
+        """
+        Iterates over the bytes in the file by chunks of `chunk_size`.
+        """
+        f = open(self, mode='rb')
+        try:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
         finally:
             f.close()
 
@@ -175,12 +495,37 @@ class path(str):
             mode = 'ab'
         else:
             mode = 'wb'
+        self._detach(keep_content=append)
         f = open(self, mode=mode)
         try:
             f.write(bytes)
         finally:
             f.close()
 
+    def write_iter(self, iterable, append=False, **kwargs):
+        """
+        Writes the chunks of bytes or text given by `iterable` to the file
+        one by one.  Text chunks are written with the given `kwargs` (e.g.
+        encoding) like :meth:`write_text`.
+
+        :param append:
+            If ``True`` the chunks are added at the end of the file.
+        """
+        iterator = iter(iterable)
+        first = next(iterator, b'')
+        if isinstance(first, bytes):
+            mode = 'ab' if append else 'wb'
+        else:
+            mode = 'a' if append else 'w'
+        self._detach(keep_content=append)
+        f = open(self, mode=mode, **kwargs)
+        try:
+            f.write(first)
+            for chunk in iterator:
+                f.write(chunk)
+        finally:
+            f.close()
+
     def exists(self):
         """
         Returns ``True`` if the path exist.
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+    Performance baselines
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Records the build time and peak RSS of tests into a baseline file, and
+    fails the tests getting meaningfully slower than the baseline::
+
+        @with_app(srcdir='/path/to/root', perf_baseline='perf.json')
+        def test_build(app, status, warning):
+            app.build()
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
+
+#: default tolerance of the regressions (ratio to the baseline)
+DEFAULT_TOLERANCE = 0.2
+
+#: default number of runs measured per test
+DEFAULT_REPEAT = 1
+
+#: the growth of the peak RSS (in bytes) regarded as noise; the regressions
+#: smaller than it are ignored
+RSS_NOISE = 1024 * 1024
+
+#: baselines given by the environment variables
+_baselines = {}
+
+
+class PerfRegression(AssertionError):
+    """
+    Raised when a test is slower (or larger) than its baseline.
+    """
+
+
+def reset_peak_rss():
+    """
+    Resets the peak RSS of the process if supported (Linux 4.0+).
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        pass  # not supported
+
+
+def current_rss():
+    """
+    Returns the current RSS of the process in bytes, or ``0`` if not
+    supported (Linux only).
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass  # not Linux
+
+    return 0
+
+
+def peak_rss():
+    """
+    Returns the peak RSS of the process in bytes since the last
+    :func:`reset_peak_rss`, or since the process started if not supported.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass  # not Linux
+
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            return rss  # in bytes
+        else:
+            return rss * 1024
+    except ImportError:
+        return 0
+
+
+class PerfBaseline(object):
+    """
+    A baseline file of the build time and peak RSS per test.  The peak RSS
+    is measured as the growth from the RSS at the start of the test, not to
+    depend on the memory left by the earlier tests.
+
+    The tests not in the file are recorded to it.  The others are compared
+    with their baseline and :exc:`PerfRegression` is raised if the build time
+    or the peak RSS exceeds the baseline by more than `tolerance`.  The
+    minimum of `repeat` runs is compared.  If `update` is ``True``, the
+    baseline is always overwritten by the measurements.
+
+    The file is updated under a lock (where :mod:`fcntl` is available) to
+    be shared by the workers of pytest-xdist.
+    """
+
+    def __init__(self, filename, tolerance=DEFAULT_TOLERANCE,
+                 repeat=DEFAULT_REPEAT, update=False):
+        self.filename = filename
+        self.tolerance = tolerance
+        self.repeat = repeat
+        self.update = update
+        self.results = OrderedDict()
+
+    def load(self):
+        try:
+            with open(self.filename) as f:
+                return json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, OSError):
+            return OrderedDict()
+
+    def save(self, baseline):
+        tmpname = '%s.%d.tmp' % (self.filename, os.getpid())
+        with open(tmpname, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        os.rename(tmpname, self.filename)
+
+    @contextmanager
+    def lock(self):
+        """
+        Locks the baseline file exclusively among processes.
+        """
+        try:
+            import fcntl
+        except ImportError:  # not supported (e.g. Windows)
+            yield
+            return
+
+        with open('%s.lock' % self.filename, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def check(self, name, measurements, srcdir, buildername, confoverrides):
+        """
+        Compares the `measurements` (pairs of the build time and the peak
+        RSS) of the test `name` with the baseline.
+        """
+        if not measurements:
+            return  # not built
+
+        record = OrderedDict([
+            ('srcdir', str(srcdir)),
+            ('buildername', buildername),
+            ('confoverrides', repr(confoverrides or {})),
+            ('build_time', min(m[0] for m in measurements)),
+            ('peak_rss', min(m[1] for m in measurements)),
+        ])
+
+        with self.lock():
+            baseline = self.load()
+            expected = baseline.get(name)
+            if expected is None or self.update:
+                baseline[name] = record
+                self.save(baseline)
+                self.results[name] = (record, None, [])
+                return
+
+        regressions = []
+        for key, noise in (('build_time', 0), ('peak_rss', RSS_NOISE)):
+            limit = expected[key] * (1 + self.tolerance)
+            if expected[key] and record[key] > max(limit,
+                                                   expected[key] + noise):
+                regressions.append(key)
+
+        self.results[name] = (record, expected, regressions)
+        if regressions:
+            raise PerfRegression(self.report(name))
+
+    def report(self, name=None):
+        """
+        Returns a report of the compared tests (or the test `name`).
+        """
+        lines = []
+        for testname, (record, expected, regressions) in self.results.items():
+            if name not in (None, testname):
+                continue
+
+            if expected is None:
+                lines.append('%s: recorded' % testname)
+            elif regressions:
+                lines.append('%s: REGRESSION' % testname)
+            else:
+                lines.append('%s: ok' % testname)
+            lines.append('    srcdir: %s' % record['srcdir'])
+            lines.append('    buildername: %s' % record['buildername'])
+            lines.append('    confoverrides: %s' % record['confoverrides'])
+            for key, unit in (('build_time', 's'), ('peak_rss', 'B')):
+                line = '    %s: %.4g%s' % (key, record[key], unit)
+                if expected and expected[key]:
+                    change = record[key] / expected[key] - 1
+                    line += ' (baseline: %.4g%s, %+.1f%%)' % (expected[key],
+                                                              unit,
+                                                              change * 100)
+                if key in regressions:
+                    line += ' !'
+                lines.append(line)
+
+        return '\n'.join(lines)
+
+
+def get_perf_baseline(perf_baseline):
+    """
+    Returns a :class:`PerfBaseline` for `perf_baseline` option of with_app.
+    If it is ``None``, ``$SPHINX_TESTING_PERF_BASELINE`` is used with
+    ``$SPHINX_TESTING_PERF_TOLERANCE``, ``$SPHINX_TESTING_PERF_REPEAT`` and
+    ``$SPHINX_TESTING_PERF_UPDATE``.
+    """
+    if perf_baseline is False:
+        return None
+    elif perf_baseline is None:
+        filename = os.environ.get('SPHINX_TESTING_PERF_BASELINE')
+        if not filename:
+            return None
+        elif filename not in _baselines:
+            environ = os.environ.get
+            _baselines[filename] = PerfBaseline(
+                filename,
+                float(environ('SPHINX_TESTING_PERF_TOLERANCE',
+                              DEFAULT_TOLERANCE)),
+                int(environ('SPHINX_TESTING_PERF_REPEAT', DEFAULT_REPEAT)),
+                bool(environ('SPHINX_TESTING_PERF_UPDATE')))
+        return _baselines[filename]
+    elif not isinstance(perf_baseline, PerfBaseline):
+        perf_baseline = PerfBaseline(perf_baseline)
+
+    return perf_baseline
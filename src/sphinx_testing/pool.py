@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+    TestApp pool
+    ~~~~~~~~~~~~
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import atexit
+from collections import OrderedDict
+from inspect import signature
+from io import StringIO
+
+from sphinx_testing.path import path
+from sphinx_testing.registry import restore_registries, save_registries
+from sphinx_testing.util import TestApp
+
+
+class AppPool(object):
+    """
+    A pool of constructed TestApp instances keyed by their construction
+    arguments.  Apps are reset before they are handed out again, and the
+    least recently used apps are cleaned up when the pool exceeds `maxsize`.
+
+    The reset restores the event listeners and the config values of the app
+    (see :meth:`TestApp.reset`).
+
+    .. note:: Modifications to the srcdir of a pooled app are not reverted
+              by the reset.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._apps = OrderedDict()
+
+    @staticmethod
+    def make_key(*args, **kwargs):
+        """
+        Returns a hashable key for the given arguments of :class:`TestApp`.
+        """
+        assert 'status' not in kwargs, 'pooled apps own the status stream'
+        assert 'warning' not in kwargs, 'pooled apps own the warning stream'
+
+        arguments = signature(TestApp.__init__).bind(None, *args, **kwargs)
+        arguments.apply_defaults()
+
+        params = []
+        for name, value in arguments.arguments.items():
+            if name in ('self', 'status', 'warning'):
+                continue
+            elif name in ('srcdir', 'confdir') and value is not None:
+                value = path(value).abspath()
+            elif isinstance(value, dict):
+                value = tuple(sorted((k, repr(v)) for k, v in value.items()))
+            elif isinstance(value, list):
+                value = tuple(value)
+            params.append((name, repr(value)))
+
+        return tuple(params)
+
+    def acquire(self, *args, **kwargs):
+        """
+        Returns a TestApp for the given arguments.  A pooled app is reset and
+        reused if available, otherwise a new app is created.
+        """
+        key = self.make_key(*args, **kwargs)
+        app = self._apps.pop(key, None)
+        if app is None:
+            # pooled apps live across tests; their leaks are not measured
+            kwargs = dict(kwargs, status=StringIO(), warning=StringIO(),
+                          leak_check=False)
+            app = TestApp(*args, **kwargs)
+            app._pool_key = key
+            app._pool_registry = save_registries()
+            app._registry_state = None  # not restored on cleanup
+        else:
+            # restore docutils components registered on construction
+            restore_registries(app._pool_registry, names=('docutils.',))
+            app.reset()
+
+        return app
+
+    def release(self, app, error=None):
+        """
+        Returns the `app` to the pool.  The app is cleaned up instead if
+        `error` is given.
+        """
+        if error:
+            app.cleanup(error=error)
+            return
+
+        self._apps[app._pool_key] = app
+        while len(self._apps) > self.maxsize:
+            _, evicted = self._apps.popitem(last=False)
+            evicted.cleanup()
+
+    def clear(self):
+        """
+        Cleans up all pooled apps.
+        """
+        while self._apps:
+            _, app = self._apps.popitem()
+            app.cleanup()
+
+
+#: the pool used by ``with_app(reuse=True)``
+default_pool = AppPool()
+atexit.register(default_pool.clear)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+    Event profiling
+    ~~~~~~~~~~~~~~~
+
+    Measures the time spent in the event handlers of Sphinx per event and
+    per extension module::
+
+        app = TestApp(srcdir=srcdir, profile_events=True)
+        app.build()
+        print(app.event_profile.report())
+        app.event_profile.export('events.json')
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import json
+from collections import OrderedDict
+from functools import wraps
+from time import perf_counter
+
+#: default number of rows shown in the report
+DEFAULT_LIMIT = 20
+
+
+class EventProfile(object):
+    """
+    The number of calls and the elapsed time of the event handlers, keyed by
+    the pairs of the event name and the module of the handler.
+
+    The time of a handler includes the handlers of the events emitted in it.
+    The handlers called in the worker processes of parallel builds are not
+    counted.
+    """
+
+    def __init__(self):
+        self.records = OrderedDict()
+
+    def wrap(self, event, handler):
+        """
+        Returns the `handler` of `event` wrapped to be measured.
+        """
+        key = (event, getattr(handler, '__module__', None) or '<unknown>')
+        self.records.setdefault(key, [0, 0.0])
+
+        @wraps(handler)
+        def measured(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                record = self.records[key]
+                record[0] += 1
+                record[1] += perf_counter() - started
+        return measured
+
+    def clear(self):
+        for record in self.records.values():
+            record[:] = [0, 0.0]
+
+    def _aggregate(self, index):
+        totals = OrderedDict()
+        for key, (calls, elapsed) in self.records.items():
+            total = totals.setdefault(key[index], [0, 0.0])
+            total[0] += calls
+            total[1] += elapsed
+        return totals
+
+    def by_event(self):
+        """
+        Returns a dict mapping the event names to the pairs of the number of
+        calls and the elapsed time.
+        """
+        return self._aggregate(0)
+
+    def by_module(self):
+        """
+        Returns a dict mapping the modules of the handlers to the pairs of
+        the number of calls and the elapsed time.
+        """
+        return self._aggregate(1)
+
+    def to_dict(self):
+        """
+        Returns the profile as a JSON-serializable dict.
+        """
+        def rows(records):
+            return [OrderedDict([('name', name), ('calls', calls),
+                                 ('time', elapsed)])
+                    for name, (calls, elapsed) in records.items()]
+
+        handlers = [OrderedDict([('event', event), ('module', module),
+                                 ('calls', calls), ('time', elapsed)])
+                    for (event, module), (calls, elapsed)
+                    in self.records.items()]
+        return OrderedDict([('handlers', handlers),
+                            ('events', rows(self.by_event())),
+                            ('modules', rows(self.by_module()))])
+
+    def export(self, filename, **extra):
+        """
+        Writes the profile (see :meth:`to_dict`) with `extra` fields to
+        `filename` as JSON.
+        """
+        profile = OrderedDict(extra)
+        profile.update(self.to_dict())
+        with open(filename, 'w') as f:
+            json.dump(profile, f, indent=2)
+
+    def report(self, limit=DEFAULT_LIMIT):
+        """
+        Returns a report of the most expensive handlers.
+        """
+        records = sorted(self.records.items(), key=lambda item: -item[1][1])
+        lines = ['%-10s %8s  %-24s %s' % ('time', 'calls', 'event', 'module')]
+        for (event, module), (calls, elapsed) in records[:limit]:
+            if calls:
+                lines.append('%9.4fs %8d  %-24s %s' %
+                             (elapsed, calls, event, module))
+        return '\n'.join(lines)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+    Global registries
+    ~~~~~~~~~~~~~~~~~
+
+    Sphinx and docutils keep some state in global registries (directives,
+    roles, nodes, translators and caches).  :func:`save_registries` takes
+    a snapshot of them and :func:`restore_registries` restores them in place.
+
+    Extensions having their own global caches can register them::
+
+        from sphinx_testing.registry import register_global
+        register_global('myext.cache', myext._cache)
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import copy
+
+import sphinx
+from docutils import nodes
+from docutils.parsers.rst import directives, roles
+
+try:
+    from sphinx.util.docutils import additional_nodes, register_node
+except ImportError:
+    # workaround for Sphinx-1.7 and older versions
+    additional_nodes = set()
+
+    def register_node(node):
+        pass
+
+try:
+    from sphinx.util.docutils import unregister_node
+except ImportError:
+    # workaround for Sphinx-1.7 and older versions
+    def unregister_node(node):
+        for visitor in (nodes.GenericNodeVisitor, nodes.SparseNodeVisitor):
+            for prefix in ('visit_', 'depart_'):
+                if hasattr(visitor, prefix + node.__name__):
+                    delattr(visitor, prefix + node.__name__)
+
+#: registries to save and restore; name -> (save, restore)
+_registries = OrderedDict()
+
+
+def register_registry(name, save, restore):
+    """
+    Registers a global registry.  `save` is called without arguments and
+    returns the state; `restore` is called with the state.
+    """
+    _registries[name] = (save, restore)
+
+
+def unregister_registry(name):
+    """
+    Unregisters the registry `name`.
+    """
+    _registries.pop(name, None)
+
+
+def _restore_container(obj, state):
+    if isinstance(obj, (dict, set)):
+        obj.clear()
+        obj.update(state)
+    else:
+        obj[:] = state
+
+
+def register_global(name, obj):
+    """
+    Registers a global dict, set or list.  It is copied on save and
+    restored in place.
+    """
+    register_registry(name, lambda: copy(obj),
+                      lambda state: _restore_container(obj, state))
+
+
+def save_registries():
+    """
+    Returns the state of the registered registries.
+    """
+    return OrderedDict((name, save())
+                       for name, (save, _) in _registries.items())
+
+
+def restore_registries(state, names=None):
+    """
+    Restores the registries to the state saved by :func:`save_registries`.
+    If `names` is given, only the registries whose name starts with any of
+    them are restored.
+    """
+    for name, value in state.items():
+        if names and not name.startswith(tuple(names)):
+            continue
+        elif name in _registries:
+            _registries[name][1](value)
+
+
+@contextmanager
+def registry_namespace():
+    """
+    Restores the registries on exit of the context.
+    """
+    state = save_registries()
+    try:
+        yield state
+    finally:
+        restore_registries(state)
+
+
+def _restore_directives(state):
+    _restore_container(directives._directives, state)
+
+
+def _restore_roles(state):
+    _restore_container(roles._roles, state)
+
+
+def _restore_nodes(state):
+    for node in list(additional_nodes):
+        if node not in state:
+            unregister_node(node)
+            additional_nodes.discard(node)
+    for node in state:
+        if node not in additional_nodes:
+            register_node(node)
+
+
+def _setup():
+    register_registry('docutils.directives',
+                      lambda: copy(directives._directives),
+                      _restore_directives)
+    register_registry('docutils.roles', lambda: copy(roles._roles),
+                      _restore_roles)
+    register_registry('docutils.nodes', lambda: set(additional_nodes),
+                      _restore_nodes)
+    register_global('sys.path', sys.path)
+
+    try:
+        from sphinx.locale import translators
+        register_global('sphinx.locale.translators', translators)
+    except ImportError:
+        pass  # Sphinx-1.4 and older versions do not have it
+
+    try:
+        from sphinx.pycode import ModuleAnalyzer
+        register_global('sphinx.pycode.ModuleAnalyzer.cache',
+                        ModuleAnalyzer.cache)
+    except (ImportError, AttributeError):
+        pass  # not available
+
+    try:
+        from sphinx.theming import Theme
+        register_global('sphinx.theming.Theme.themes', Theme.themes)
+    except AttributeError:
+        pass  # Sphinx-1.6+ does not cache themes globally
+
+    if sphinx.version_info < (2, 0):
+        # Sphinx-2.0+ does not have AutoDirective and its cache
+        from sphinx.ext.autodoc import AutoDirective
+        register_global('sphinx.ext.autodoc.AutoDirective._registry',
+                        AutoDirective._registry)
+
+
+_setup()
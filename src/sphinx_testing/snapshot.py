@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+    Snapshots of directory trees
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import hashlib
+
+from sphinx_testing.path import path
+
+
+class TreeDiff(object):
+    """
+    A difference between two :class:`TreeSnapshot` objects.  Each attribute
+    is a set of relative paths (separated by ``/``) of files.
+    """
+
+    def __init__(self, added, removed, modified, untouched):
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.untouched = untouched
+
+    def __repr__(self):
+        classname = self.__class__.__name__
+        return ('<%s added=%d removed=%d modified=%d untouched=%d>' %
+                (classname, len(self.added), len(self.removed),
+                 len(self.modified), len(self.untouched)))
+
+    @property
+    def changed(self):
+        """
+        The files added or modified.
+        """
+        return self.added | self.modified
+
+
+class TreeSnapshot(object):
+    """
+    A cheap snapshot of the files in a directory tree.  It records the size,
+    modification time and inode number of each file from a single scandir
+    pass.  Content hashes are computed only on demand by :meth:`digest`.
+    """
+
+    def __init__(self, root, entries):
+        self.root = path(root)
+        self.entries = entries
+        self._digests = {}
+
+    @classmethod
+    def take(cls, root, prune=()):
+        """
+        Takes a snapshot of the files under `root`.  Directories matching
+        `prune` patterns are skipped (see :meth:`path.walk`).
+        """
+        entries = {}
+        for relpath, entry in path(root)._scan(prune):
+            if entry.is_file():
+                stat = entry.stat()
+                entries[relpath] = (stat.st_size, stat.st_mtime_ns,
+                                    stat.st_ino)
+
+        return cls(root, entries)
+
+    def __repr__(self):
+        classname = self.__class__.__name__
+        return '<%s root=%r files=%d>' % (classname, self.root,
+                                          len(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, relpath):
+        return relpath in self.entries
+
+    def digest(self, relpath):
+        """
+        Returns the content hash of the file and caches it.  It reads the
+        current content of the file; call it before the file is changed to
+        compare contents in :meth:`diff`.
+        """
+        if relpath not in self._digests:
+            digest = hashlib.sha1()
+            for chunk in (self.root / relpath).iter_bytes():
+                digest.update(chunk)
+            self._digests[relpath] = digest.hexdigest()
+
+        return self._digests[relpath]
+
+    def diff(self, other, compare_content=False):
+        """
+        Returns a :class:`TreeDiff` from the snapshot to the newer snapshot
+        `other`.  Files whose size, mtime or inode differ are regarded as
+        modified.
+
+        :param compare_content:
+            If ``True``, the modified files whose content hash has been cached
+            in this snapshot are compared by content, and are regarded as
+            untouched if the content is identical.
+        """
+        old = set(self.entries)
+        new = set(other.entries)
+        modified = set()
+        untouched = set()
+        for relpath in old & new:
+            if self.entries[relpath] == other.entries[relpath]:
+                untouched.add(relpath)
+            elif (compare_content and relpath in self._digests and
+                    self._digests[relpath] == other.digest(relpath)):
+                untouched.add(relpath)
+            else:
+                modified.add(relpath)
+
+        return TreeDiff(new - old, old - new, modified, untouched)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+    Declarative source trees
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    A tree spec is a dict mapping filenames to their contents::
+
+        {
+            'conf.py': {'extensions': ['sphinx.ext.todo']},
+            'index.rst': 'Hello world\\n',
+            'sub': {'doc.rst': b'...'},
+        }
+
+    Keys are relative paths (separated by ``/``).  Values are text, bytes or
+    dicts for subdirectories.  The value of ``conf.py`` can also be a dict of
+    conf settings.  An empty ``conf.py`` is added if not given.
+
+    :copyright: Copyright 2007-2019 by Takeshi KOMIYA
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+
+from sphinx_testing.path import path
+from sphinx_testing.snapshot import TreeSnapshot
+
+#: the name of the manifest of cached trees
+MANIFEST_FILENAME = 'manifest.json'
+
+#: default maximum size of the tree cache in bytes
+DEFAULT_MAXSIZE = 256 * 1024 * 1024
+
+
+def render_conf(settings):
+    """
+    Renders a dict of conf settings to the content of ``conf.py``.
+    """
+    lines = ['%s = %r\n' % (name, settings[name]) for name in sorted(settings)]
+    return ''.join(lines)
+
+
+def flatten_spec(spec, prefix=''):
+    """
+    Converts a tree spec to a dict mapping relative paths to bytes.
+    """
+    files = {}
+    for name, content in spec.items():
+        relpath = prefix + name.strip('/')
+        if relpath == 'conf.py' and isinstance(content, dict):
+            content = render_conf(content)
+
+        if isinstance(content, dict):
+            files.update(flatten_spec(content, relpath + '/'))
+        elif isinstance(content, bytes):
+            files[relpath] = content
+        else:
+            files[relpath] = content.encode('utf-8')
+
+    if not prefix:
+        files.setdefault('conf.py', b'')
+    return files
+
+
+def spec_digest(files):
+    """
+    Returns a hex digest of the flattened tree spec `files`.
+    """
+    digest = hashlib.sha256()
+    for relpath in sorted(files):
+        content = files[relpath]
+        digest.update(relpath.encode('utf-8') + b'\0')
+        digest.update(str(len(content)).encode('ascii') + b'\0')
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def write_tree(root, files):
+    """
+    Writes the flattened tree spec `files` into `root`.
+    """
+    for relpath, content in files.items():
+        filename = os.path.join(root, *relpath.split('/'))
+        dirname = os.path.dirname(filename)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(filename, 'wb') as f:
+            f.write(content)
+
+
+class TreeCache(object):
+    """
+    A content-addressed cache of the source trees made from tree specs.
+
+    Each spec is written to the cache only once; :meth:`materialize` clones
+    the cached tree (see :meth:`path.clonetree`) for each call.  The cached
+    trees are verified with the manifest of their sizes and mtimes, and are
+    rewritten if they have been modified through the clones.
+
+    The least recently used trees are removed when the total size of the
+    cache exceeds `maxsize` bytes.
+    """
+
+    def __init__(self, cachedir=None, maxsize=DEFAULT_MAXSIZE):
+        if cachedir is None:
+            cachedir = default_cachedir()
+        self.cachedir = path(cachedir)
+        self.maxsize = maxsize
+
+    def lookup(self, files):
+        """
+        Returns the cached tree of the flattened tree spec `files`.  The tree
+        is written to the cache if not cached yet.
+        """
+        entry = self.cachedir / spec_digest(files)
+        root = entry / 'root'
+        manifest = entry / MANIFEST_FILENAME
+        try:
+            if root.isdir():
+                with open(manifest) as f:
+                    if json.load(f) == self.manifest(root):
+                        os.utime(entry, None)  # mark as recently used
+                        return root
+        except (OSError, ValueError):
+            pass  # broken entry
+
+        tmpentry = self.cachedir / ('.%s' % uuid.uuid4().hex)
+        try:
+            write_tree(tmpentry / 'root', files)
+            manifest = json.dumps(self.manifest(tmpentry / 'root'))
+            (tmpentry / MANIFEST_FILENAME).write_text(manifest)
+            size = sum(len(content) for content in files.values())
+            (tmpentry / 'size.txt').write_text(str(size))
+            if entry.exists():
+                entry.rmtree(True)
+            os.rename(tmpentry, entry)
+        except OSError:
+            if not entry.exists():
+                raise
+            # another process has stored the entry concurrently
+        finally:
+            shutil.rmtree(tmpentry, True)
+
+        self.evict(keep=entry)
+        return root
+
+    @staticmethod
+    def manifest(root):
+        snapshot = TreeSnapshot.take(root)
+        return {relpath: list(stat[:2])
+                for relpath, stat in snapshot.entries.items()}
+
+    def materialize(self, spec, destination):
+        """
+        Makes the source tree of `spec` at `destination`.
+        """
+        self.lookup(flatten_spec(spec)).clonetree(destination)
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used entries (except `keep`) until the
+        total size of the cache fits in `maxsize`.  The trees materialized
+        from the removed entries are not affected.
+        """
+        entries = []
+        for name in os.listdir(self.cachedir):
+            entry = self.cachedir / name
+            try:
+                size = int((entry / 'size.txt').read_bytes())
+                entries.append((os.stat(entry).st_mtime, size, entry))
+            except (IOError, OSError, ValueError):
+                pass  # incomplete entry
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.maxsize:
+                break
+            elif entry != keep:
+                shutil.rmtree(entry, True)
+                total -= size
+
+    def clear(self):
+        """
+        Removes all entries in the cache.
+        """
+        shutil.rmtree(self.cachedir, True)
+
+
+def default_cachedir():
+    """
+    Returns the directory of the tree cache; ``$SPHINX_TESTING_TREE_CACHE``
+    or ``sphinx-testing`` directory under the user cache directory.
+    """
+    cachedir = os.environ.get('SPHINX_TESTING_TREE_CACHE')
+    if cachedir:
+        return path(cachedir)
+
+    cachehome = os.environ.get('XDG_CACHE_HOME')
+    if not cachehome:
+        cachehome = os.path.join(os.path.expanduser('~'), '.cache')
+    return path(cachehome) / 'sphinx-testing' / 'trees'
+
+
+def get_tree_cache(tree_cache):
+    """
+    Returns a :class:`TreeCache` for `tree_cache` argument of TestApp, or
+    ``None`` if the spec should be written directly.  If it is ``None`` or
+    ``True``, the default cache is used unless its directory is not writable
+    (e.g. read-only home directory).
+    """
+    if tree_cache is False:
+        return None
+    elif tree_cache is None or tree_cache is True:
+        tree_cache = TreeCache()
+
+    try:
+        tree_cache.cachedir.makedirs()
+    except OSError:
+        pass  # already exists (or not writable)
+
+    if os.access(tree_cache.cachedir, os.W_OK):
+        return tree_cache
+    else:
+        return None
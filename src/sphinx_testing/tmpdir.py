@@ -7,27 +7,356 @@
     :license: BSD, see LICENSE for details.
 """
 
+import os
+import atexit
+import shutil
+import threading
 from functools import wraps
-from sphinx_testing.path import path
+from uuid import uuid4
+from sphinx_testing.path import path, _discard_cow_roots
 
+#: number of threads deleting trees in background
+DEFERRED_CLEANUP_WORKERS = 2
 
-def mkdtemp(suffix='', prefix='tmp', dir=None):
+#: candidates of memory-backed (tmpfs) directories; overridden by
+#: ``$SPHINX_TESTING_MEMORY_TMPDIR``
+MEMORY_TMPDIRS = ('/dev/shm',)
+
+#: trees larger than this size (in bytes) are not placed on memory
+MEMORY_THRESHOLD = 256 * 1024 * 1024
+
+#: default number of directories kept ready by :class:`TmpdirPool`
+DEFAULT_POOL_SIZE = 8
+
+_executor = None
+_futures = set()
+_lock = threading.Lock()
+_pool = None
+_forked = False
+
+
+def tree_size(root):
+    """
+    Returns the total size of files in `root` in bytes.
+    """
+    size = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            size += os.lstat(os.path.join(dirpath, filename)).st_size
+    return size
+
+
+def memory_tmpdir(size_hint=0, threshold=None):
+    """
+    Returns a memory-backed directory to make temporary directories in, or
+    ``None`` if not available.
+
+    :param size_hint:
+        The estimated size of the tree placed in the directory.  ``None`` is
+        returned if it exceeds `threshold` (:data:`MEMORY_THRESHOLD` by
+        default) or the free space of the directory.
+    """
+    if threshold is None:
+        threshold = MEMORY_THRESHOLD
+    if size_hint > threshold:
+        return None
+
+    candidates = MEMORY_TMPDIRS
+    if os.environ.get('SPHINX_TESTING_MEMORY_TMPDIR'):
+        candidates = os.environ['SPHINX_TESTING_MEMORY_TMPDIR'].split(':')
+
+    for candidate in candidates:
+        if os.path.isdir(candidate) and os.access(candidate, os.W_OK):
+            try:
+                stat = os.statvfs(candidate)
+                if stat.f_bavail * stat.f_frsize > size_hint:
+                    return path(candidate)
+            except (AttributeError, OSError):
+                pass  # not supported
+
+    return None
+
+
+def mkdtemp(suffix='', prefix='tmp', dir=None, memory=False, size_hint=0,
+            skeleton=()):
+    """
+    Makes a temporary directory and returns it as :class:`path`.
+
+    If `memory` is ``True`` and `dir` is not given, the directory is made on
+    a memory-backed filesystem if available (see :func:`memory_tmpdir`).
+
+    `skeleton` is a list of subdirectories made in the directory.  If the
+    tmpdir pool is enabled (see :func:`enable_pool`), the directory with the
+    skeleton is taken from the pool unless `suffix`, `prefix` or `dir` is
+    given.
+    """
     import tempfile
+    pool = get_pool()
+    if pool is not None and (suffix, prefix, dir) == ('', 'tmp', None):
+        if memory:
+            dir = memory_tmpdir(size_hint)
+        return pool.acquire(dir, skeleton)
+
+    if memory and dir is None:
+        dir = memory_tmpdir(size_hint)
+
     if isinstance(dir, path):
         tmpdir = tempfile.mkdtemp(suffix, prefix, str(dir))
     else:
         tmpdir = tempfile.mkdtemp(suffix, prefix, dir)
 
+    for subdir in skeleton:
+        os.makedirs(os.path.join(tmpdir, subdir))
+
     return path(tmpdir)
 
 
-def with_tmpdir(func):
+def rmtree(tree, deferred=False):
+    """
+    Removes the `tree` ignoring errors.
+
+    If `deferred` is ``True``, the tree is renamed to a trash name next to it
+    and deleted by a background thread.  Pending deletions are drained at
+    interpreter exit (or by :func:`drain`).
+
+    The directories taken from the tmpdir pool (see :func:`enable_pool`) are
+    always deleted in background and recycled to the pool.
+    """
+    _discard_cow_roots(tree)
+    if _pool is not None and _pool.release(tree):
+        return
+
+    if not deferred:
+        shutil.rmtree(tree, True)
+        return
+
+    trash = _move_to_trash(tree)
+    if trash is None:
+        shutil.rmtree(tree, True)  # not exists or not renamable
+    else:
+        _submit(shutil.rmtree, trash, True)
+
+
+def _move_to_trash(tree):
+    trash = os.path.join(os.path.dirname(os.path.abspath(tree)),
+                         '.trash-%s' % uuid4().hex)
+    try:
+        os.rename(tree, trash)
+        return trash
+    except OSError:
+        return None
+
+
+def _submit(func, *args):
+    """
+    Runs `func` in background.  It is waited by :func:`drain`.
+    """
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(DEFERRED_CLEANUP_WORKERS)
+            atexit.register(drain)
+
+        future = _executor.submit(func, *args)
+        _futures.add(future)
+        future.add_done_callback(_futures.discard)
+
+
+class TmpdirPool(object):
+    """
+    A pool of temporary directories made in background.
+
+    The directories are made under a parent directory per worker process
+    (``$PYTEST_XDIST_WORKER`` or the process ID) to avoid contention on the
+    shared temporary directory.  Up to `size` directories are kept ready for
+    each pair of the base directory and the skeleton (see :func:`mkdtemp`).
+    The released directories are deleted and replaced by new ones in
+    background.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        self.size = size
+        self._parents = {}
+        self._ready = {}
+        self._leased = {}
+        self._lock = threading.Lock()
+
+    def _parent(self, dir):
+        import tempfile
+        with self._lock:
+            if dir not in self._parents:
+                worker = os.environ.get('PYTEST_XDIST_WORKER', os.getpid())
+                prefix = 'sphinx-testing-%s-' % worker
+                self._parents[dir] = path(tempfile.mkdtemp('', prefix,
+                                                           dir and str(dir)))
+            return self._parents[dir]
+
+    def _make(self, key):
+        import tempfile
+        dir, skeleton = key
+        tmpdir = tempfile.mkdtemp(dir=self._parent(dir))
+        for subdir in skeleton:
+            os.makedirs(os.path.join(tmpdir, subdir))
+        return path(tmpdir)
+
+    def _fill(self, key):
+        while True:
+            with self._lock:
+                ready = self._ready.setdefault(key, [])
+                if len(ready) >= self.size or self.size == 0:
+                    return
+            tmpdir = self._make(key)
+            with self._lock:
+                ready.append(tmpdir)
+
+    def _recycle(self, trash, key):
+        shutil.rmtree(trash, True)
+        self._fill(key)
+
+    def prewarm(self, dir=None, skeleton=()):
+        """
+        Makes ready directories for `dir` and `skeleton` in background.
+        """
+        _submit(self._fill, (dir, tuple(skeleton)))
+
+    def acquire(self, dir=None, skeleton=()):
+        """
+        Returns a directory having `skeleton` in `dir`.
+        """
+        key = (dir, tuple(skeleton))
+        with self._lock:
+            ready = self._ready.setdefault(key, [])
+            tmpdir = ready.pop() if ready else None
+            refill = len(ready) < self.size // 2
+
+        if tmpdir is None:
+            tmpdir = self._make(key)
+        if refill:
+            self.prewarm(dir, skeleton)
+
+        with self._lock:
+            self._leased[os.path.abspath(tmpdir)] = key
+        return tmpdir
+
+    def release(self, tmpdir):
+        """
+        Deletes the directory taken from the pool in background, and makes
+        a new one instead.  Returns ``False`` if it is not taken from the
+        pool.
+        """
+        with self._lock:
+            key = self._leased.pop(os.path.abspath(tmpdir), None)
+        if key is None:
+            return False
+
+        trash = _move_to_trash(tmpdir)
+        if trash is None:
+            shutil.rmtree(tmpdir, True)
+            self.prewarm(*key)
+        else:
+            _submit(self._recycle, trash, key)
+        return True
+
+    def clear(self):
+        """
+        Removes all directories made by the pool.
+        """
+        drain()
+        with self._lock:
+            for parent in self._parents.values():
+                shutil.rmtree(parent, True)
+            self._parents.clear()
+            self._ready.clear()
+            self._leased.clear()
+
+
+def enable_pool(size=DEFAULT_POOL_SIZE):
+    """
+    Enables the tmpdir pool; :func:`mkdtemp` (and :func:`with_tmpdir` and
+    TestApp) takes directories from it.  It is also enabled by
+    ``$SPHINX_TESTING_TMPDIR_POOL`` (the size of the pool).
+
+    The pool is not inherited by forked processes (e.g. the workers of
+    :func:`~sphinx_testing.batch.run_builds`); they make directories as usual.
+    """
+    global _pool
+
+    disable_pool()
+    _pool = TmpdirPool(size)
+    atexit.register(_pool.clear)
+    return _pool
+
+
+def disable_pool():
+    """
+    Disables the tmpdir pool and removes its directories.
+    """
+    global _pool
+
+    if _pool is not None:
+        atexit.unregister(_pool.clear)
+        _pool.clear()
+        _pool = None
+
+
+def get_pool():
+    """
+    Returns the enabled :class:`TmpdirPool` or ``None``.
+    """
+    if (_pool is None and not _forked and
+            os.environ.get('SPHINX_TESTING_TMPDIR_POOL')):
+        enable_pool(int(os.environ['SPHINX_TESTING_TMPDIR_POOL']))
+    return _pool
+
+
+def _reset_after_fork():
+    """
+    Resets the state inherited from the parent process on fork.  The threads
+    of the executor do not exist in the child, and the directories of the
+    pool are owned by the parent; the child does not use the pool.
+    """
+    global _executor, _futures, _lock, _pool, _forked
+
+    _executor = None
+    _futures = set()
+    _lock = threading.Lock()
+    if _pool is not None:
+        atexit.unregister(_pool.clear)
+        _pool = None
+    _forked = True
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def drain():
+    """
+    Waits until the deferred deletions have finished.
+    """
+    from concurrent.futures import wait
+    wait(list(_futures))
+
+
+def with_tmpdir(func=None, deferred=False, memory=False):
+    """
+    Make a temporary directory, pass it to the test and remove it after the
+    test.  If `deferred` is ``True``, it is removed in background (see
+    :func:`rmtree`).  If `memory` is ``True``, it is made on a memory-backed
+    filesystem if available.
+    """
+    if func is None:
+        return lambda func: with_tmpdir(func, deferred=deferred,
+                                        memory=memory)
+
     @wraps(func)
     def decorator(*args, **kwargs):
         try:
-            tmpdir = mkdtemp()
+            tmpdir = mkdtemp(memory=memory)
             args = args + (tmpdir,)  # extends argument; add tmpdir at tail
             return func(*args, **kwargs)
         finally:
-            tmpdir.rmtree()
+            rmtree(tmpdir, deferred=deferred)
     return decorator
@@ -7,64 +7,232 @@
     :license: BSD, see LICENSE for details.
 """
 
+import json
 import os.path
-import shutil
+import sys
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from copy import copy
 from io import StringIO
 from functools import wraps
+from inspect import signature
 from textwrap import dedent
+from time import perf_counter
 
 import sphinx.application
 from sphinx import __version__ as sphinx_version
 from sphinx.application import Sphinx
+from sphinx_testing.leak import get_leak_check
 from sphinx_testing.path import path
-from sphinx_testing.tmpdir import mkdtemp
+from sphinx_testing.perf import (
+    current_rss, get_perf_baseline, peak_rss, reset_peak_rss
+)
+from sphinx_testing.registry import restore_registries, save_registries
+from sphinx_testing.snapshot import TreeSnapshot
+from sphinx_testing.tmpdir import mkdtemp, rmtree, tree_size
 
 try:
     from sphinx.util.docutils import docutils_namespace
 except ImportError:
     # workaround for Sphinx-1.4 and older versions
-    from contextlib import contextmanager
-
     @contextmanager
     def docutils_namespace():
         yield
 
 
+RebuildResult = namedtuple('RebuildResult', ['reread', 'rewritten',
+                                             'removed', 'elapsed'])
+
+#: source files counted to determine the number of parallel workers
+SOURCE_PATTERNS = ('*.rst', '*.txt', '*.md')
+
+#: minimum number of documents per parallel worker
+DOCS_PER_WORKER = 20
+
+
+def available_cpus():
+    """
+    Returns the number of CPUs available to the process.  It respects the
+    CPU affinity, the CPU quota of cgroups and the number of pytest-xdist
+    workers sharing the CPUs.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quotas = (('/sys/fs/cgroup/cpu.max', None),  # cgroup v2
+              ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us',
+               '/sys/fs/cgroup/cpu/cpu.cfs_period_us'))
+    for quota, period in quotas:
+        try:
+            with open(quota) as f:
+                values = f.read().split()
+            if period:
+                with open(period) as f:
+                    values += f.read().split()
+            if values[0] not in ('max', '-1'):
+                limit = int(values[0]) // int(values[1])
+                cpus = min(cpus, max(limit, 1))
+                break
+        except (OSError, IndexError, ValueError, ZeroDivisionError):
+            pass  # not limited
+
+    workers = os.environ.get('PYTEST_XDIST_WORKER_COUNT')
+    if workers and workers.isdigit() and int(workers) > 0:
+        cpus = max(cpus // int(workers), 1)
+
+    return cpus
+
+
+def auto_parallel(srcdir, cpus=None):
+    """
+    Returns the number of parallel workers for the documents in `srcdir`.
+    It is ``0`` (serial) if the root is too small to benefit from forking
+    workers.
+    """
+    if cpus is None:
+        cpus = available_cpus()
+
+    sources = path(srcdir).walk(include=SOURCE_PATTERNS, prune=('_build',))
+    workers = min(cpus, len(list(sources)) // DOCS_PER_WORKER)
+    if workers < 2:
+        return 0
+    else:
+        return workers
+
+
+def _copy_value(value):
+    """
+    Returns a shallow copy of `value` if it is a mutable container.
+    """
+    if isinstance(value, (list, dict, set)):
+        return copy(value)
+    else:
+        return value
+
+
 class TestApp(Sphinx):
     """
     A subclass of :class:`Sphinx` that runs on the test root, with some
     better default values for the initialization parameters.
+
+    If `copy_srcdir_to_tmpdir` is ``'clone'``, the source directory is cloned
+    with :meth:`path.clonetree` instead of being copied entirely.  If it is
+    ``'overlay'``, the source directory is overlaid with
+    :meth:`path.overlaytree`; only the directories are created and the files
+    written through :class:`path` are materialized on write.
+
+    If `create_new_srcdir` is a dict, it is regarded as a tree spec (see
+    :mod:`sphinx_testing.spec`) and the new source directory is cloned from
+    a :class:`~sphinx_testing.spec.TreeCache`.  `tree_cache` takes a TreeCache
+    object, or ``False`` to write the spec directly into the directory.
+
+    If `build_cache` is enabled, the results of the first build are restored
+    from (or stored into) a :class:`~sphinx_testing.cache.BuildCache`.  It
+    takes ``True``, ``False``, a BuildCache object or ``None`` (enabled only
+    if ``$SPHINX_TESTING_BUILD_CACHE`` is set).  The cache is keyed by the
+    source tree at the first build; see the BuildCache for its limits.  It is
+    disabled if `freshenv` or `warningiserror` is given.
+
+    If `deferred_cleanup` is ``True``, :meth:`cleanup` deletes the build
+    trees in background.
+
+    If `memory` is ``True``, the temporary directories (including builddir)
+    are made on a memory-backed filesystem unless the estimated size of
+    the build exceeds :data:`~sphinx_testing.tmpdir.MEMORY_THRESHOLD`.
+
+    If `parallel` is ``'auto'``, the number of parallel workers is chosen
+    by :func:`auto_parallel` and reported in the status output.
+
+    If `leak_check` is given (``True`` or a
+    :class:`~sphinx_testing.leak.LeakCheck`), the memory retained after
+    :meth:`cleanup` is measured with :mod:`tracemalloc`, and the check fails
+    if it exceeds the threshold.  It is also enabled by
+    ``$SPHINX_TESTING_LEAK_CHECK``.  The apps made by :class:`with_app` are
+    measured after they are released; otherwise the memory held by the app
+    itself (e.g. its config and templates) is counted as retained.
+
+    If `profile_events` is ``True``, the event handlers are measured and
+    the result is available as :attr:`event_profile` (see
+    :class:`~sphinx_testing.profiling.EventProfile`).
+
+    The global registries of Sphinx and docutils are saved on construction
+    and restored by :meth:`cleanup` (see :mod:`sphinx_testing.registry`).
+
+    The time spent in each phase (``create_srcdir``, ``copy_srcdir``,
+    ``build_cache``, ``init``, ``build`` and ``cleanup``) is recorded in
+    :attr:`timings` in seconds.
     """
 
+    #: ratio of the estimated size of build trees to the size of srcdir
+    BUILD_SIZE_RATIO = 4
+
     def __init__(self, srcdir=None, confdir=None, outdir=None, doctreedir=None,
                  buildername='html', confoverrides=None, status=None,
                  warning=None, freshenv=False, warningiserror=False, tags=None,
                  copy_srcdir_to_tmpdir=False, create_new_srcdir=False,
-                 cleanup_on_errors=True, verbosity=0, parallel=0):
+                 cleanup_on_errors=True, verbosity=0, parallel=0,
+                 build_cache=None, deferred_cleanup=False, memory=False,
+                 leak_check=None, profile_events=False, tree_cache=None):
+        self.event_profile = None
+        if profile_events:
+            from sphinx_testing.profiling import EventProfile
+            self.event_profile = EventProfile()
+
+        self.leak_check = get_leak_check(leak_check)
+        self._registry_state = save_registries()
+
         self.cleanup_trees = []
+        self._tags = list(tags or [])
         self.cleanup_on_errors = cleanup_on_errors
+        self.deferred_cleanup = deferred_cleanup
+        self.build_cache = None
+        self.timings = OrderedDict()
 
         if create_new_srcdir:
             assert srcdir is None, 'conflicted: create_new_srcdir, srcdir'
-            tmpdir = mkdtemp()
-            self.cleanup_trees.append(tmpdir)
-            tmproot = tmpdir / 'root'
-            tmproot.makedirs()
-            (tmproot / 'conf.py').write_text('')
-            srcdir = tmproot
+            with self.timer('create_srcdir'):
+                tmpdir = mkdtemp(memory=memory)
+                self.cleanup_trees.append(tmpdir)
+                tmproot = tmpdir / 'root'
+                if isinstance(create_new_srcdir, dict):
+                    from sphinx_testing.spec import (
+                        flatten_spec, get_tree_cache, write_tree
+                    )
+                    tree_cache = get_tree_cache(tree_cache)
+                    if tree_cache:
+                        tree_cache.materialize(create_new_srcdir, tmproot)
+                    else:
+                        write_tree(tmproot, flatten_spec(create_new_srcdir))
+                else:
+                    tmproot.makedirs()
+                    (tmproot / 'conf.py').write_text('')
+                srcdir = tmproot
 
         assert srcdir is not None, 'srcdir not found'
         srcdir = path(srcdir).abspath()
 
+        size_hint = 0
+        if memory:
+            size_hint = tree_size(srcdir) * self.BUILD_SIZE_RATIO
+
         if copy_srcdir_to_tmpdir:
-            tmpdir = mkdtemp()
-            self.cleanup_trees.append(tmpdir)
-            tmproot = tmpdir / srcdir.basename()
-            srcdir.copytree(tmproot)
+            with self.timer('copy_srcdir'):
+                tmpdir = mkdtemp(memory=memory, size_hint=size_hint)
+                self.cleanup_trees.append(tmpdir)
+                tmproot = tmpdir / srcdir.basename()
+                if copy_srcdir_to_tmpdir == 'clone':
+                    srcdir.clonetree(tmproot)
+                elif copy_srcdir_to_tmpdir == 'overlay':
+                    srcdir.overlaytree(tmproot)
+                else:
+                    srcdir.copytree(tmproot)
             srcdir = tmproot
             self.builddir = srcdir.joinpath('_build')
         else:
-            self.builddir = mkdtemp()
+            self.builddir = mkdtemp(memory=memory, size_hint=size_hint,
+                                    skeleton=('doctrees', buildername))
             self.cleanup_trees.append(self.builddir)
 
         if confdir is None:
@@ -83,99 +251,517 @@ class TestApp(Sphinx):
             status = StringIO()
         if warning is None:
             warning = StringIO()
+        if hasattr(warning, 'set_srcdir'):  # WarningLog
+            warning.set_srcdir(srcdir)
+
+        if parallel == 'auto':
+            parallel = auto_parallel(srcdir)
+            status.write('parallel: auto (%d workers)\n' % parallel)
+
+        # the cached build does not emit the warnings to be turned into
+        # errors; it would hide the failures of warningiserror
+        if not freshenv and not warningiserror:
+            from sphinx_testing.cache import get_build_cache
+            self.build_cache = get_build_cache(build_cache)
+        if self.build_cache:
+            self._build_cache_args = (srcdir, buildername, confoverrides,
+                                      tags, confdir, verbosity)
 
         # unwrap ModuleWrapper (deprecated_alias)
         application = sphinx.application
         while hasattr(application, '_module'):
             application = application._module
 
+        if self.leak_check:
+            self.leak_check.start()
+
         try:
             application.abspath = lambda x: x
-            if sphinx_version < '1.3':
-                Sphinx.__init__(self, srcdir, confdir, outdir, doctreedir,
-                                buildername, confoverrides, status,
-                                warning, freshenv, warningiserror, tags)
-            else:
-                Sphinx.__init__(self, srcdir, confdir, outdir, doctreedir,
-                                buildername, confoverrides, status,
-                                warning, freshenv, warningiserror, tags,
-                                verbosity, parallel)
+            with self.timer('init'):
+                if sphinx_version < '1.3':
+                    Sphinx.__init__(self, srcdir, confdir, outdir, doctreedir,
+                                    buildername, confoverrides, status,
+                                    warning, freshenv, warningiserror, tags)
+                else:
+                    Sphinx.__init__(self, srcdir, confdir, outdir, doctreedir,
+                                    buildername, confoverrides, status,
+                                    warning, freshenv, warningiserror, tags,
+                                    verbosity, parallel)
+        except BaseException:
+            if self.leak_check:
+                self.leak_check.cancel()
+            raise
         finally:
             application.abspath = os.path.abspath
 
+        self._initial_state = self._save_state()
+
     def __repr__(self):
         classname = self.__class__.__name__
         return '<%s buildername=%r>' % (classname, self.builder.name)
 
+    def connect(self, event, callback, *args, **kwargs):
+        if self.event_profile is not None:
+            callback = self.event_profile.wrap(event, callback)
+        return Sphinx.connect(self, event, callback, *args, **kwargs)
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Measures the time of the block and adds it to :attr:`timings` as
+        `phase`.
+        """
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - started
+            self.timings[phase] = self.timings.get(phase, 0) + elapsed
+
+    def export_timings(self, filename, **extra):
+        """
+        Appends :attr:`timings` to `filename` as a line of JSON with `extra`
+        fields.
+        """
+        record = OrderedDict(extra)
+        record['srcdir'] = str(self.srcdir)
+        record['buildername'] = self.builder.name
+        record['timings'] = self.timings
+        with open(filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def build(self, *args, **kwargs):
+        if not self.build_cache:
+            with self.timer('build'):
+                return Sphinx.build(self, *args, **kwargs)
+
+        # the key is made on the first build to include the modifications
+        # of srcdir after the construction (e.g. write_docstring)
+        build_cache, self.build_cache = self.build_cache, None  # 1st only
+        with self.timer('build_cache'):
+            key = build_cache.make_key(*self._build_cache_args)
+            srcdir = self._build_cache_args[0]
+            cached_warnings = build_cache.restore(key, srcdir, self.outdir,
+                                                  self.doctreedir)
+            if cached_warnings is not None:
+                self._reload_env()
+
+        with self.timer('build'):
+            getvalue = getattr(self._warning, 'getvalue', lambda: '')
+            offset = len(getvalue())
+            Sphinx.build(self, *args, **kwargs)
+
+        if cached_warnings is not None:
+            self._warning.write(cached_warnings)
+        elif build_cache.make_key(*self._build_cache_args) == key:
+            # srcdir is not modified during the build
+            build_cache.store(key, srcdir, self.outdir, self.doctreedir,
+                              getvalue()[offset:])
+
+    def _reload_env(self, freshenv=False):
+        """
+        Replaces the build environment by the one pickled in doctreedir (or
+        a new one if `freshenv` is ``True``).
+        """
+        env = self._init_env(freshenv=freshenv)
+        if env is not None:  # Sphinx-3.0+ returns the new environment
+            self.env = env
+        if hasattr(self, '_post_init_env'):
+            self._post_init_env()
+        self.builder.env = self.env
+
+    def build_for(self, buildernames, *args, **kwargs):
+        """
+        Builds the project with each builder in `buildernames` in turn and
+        returns a dict mapping the names to their outdirs.
+
+        The builders share the environment and doctreedir; the documents
+        are read only once and the later builders only write their outputs.
+        The outputs of the other builders are written to the directories
+        named after them, next to outdir.  The builder of the app is restored
+        after the builds.
+        """
+        builder, outdir, tags = self.builder, self.outdir, list(self.tags)
+        outdirs = OrderedDict()
+        try:
+            for name in buildernames:
+                if name != self.builder.name:
+                    self._switch_builder(name, os.path.join(
+                        os.path.dirname(outdir), name))
+                self.build(*args, **kwargs)
+                outdirs[name] = self.outdir
+        finally:
+            if self.builder is not builder:
+                self._untag_builder()
+                self.builder, self.outdir = builder, outdir
+                for tag in tags:
+                    self.tags.add(tag)
+
+        return outdirs
+
+    @staticmethod
+    def _builder_tags(builder):
+        return (builder.format, builder.name,
+                'format_%s' % builder.format, 'builder_%s' % builder.name)
+
+    def _untag_builder(self):
+        for tag in self._builder_tags(self.builder):
+            if tag in self.tags and tag not in self._tags:
+                self.tags.remove(tag)
+
+        # workaround for recent Sphinx; Tags caches the evaluated conditions
+        # without invalidating them on changes
+        if hasattr(self.tags, '_condition_cache'):
+            self.tags._condition_cache.clear()
+
+    def _switch_builder(self, name, outdir):
+        # the build cache is keyed by the builder given on construction
+        self.build_cache = None
+        self._untag_builder()
+        self.outdir = type(self.outdir)(outdir)
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir)
+        if hasattr(self, 'create_builder'):
+            self.builder = self.create_builder(name)
+            self._init_builder()
+        else:
+            # workaround for Sphinx-1.6 and older versions
+            self._init_builder(name)
+
+    def rebuild(self, changed=(), added=None, removed=()):
+        """
+        Modifies the source files and builds the project again.  Returns
+        a :class:`RebuildResult` having the sets of docnames re-read,
+        the output files (relative to outdir) rewritten and removed, and the
+        elapsed time of the build in seconds::
+
+            app.build()
+            result = app.rebuild(changed=['index.rst'])
+            assert len(result.reread) <= 3
+
+        :param changed:
+            The filenames (relative to srcdir) to touch, or a dict mapping
+            them to the new contents.
+        :param added:
+            A dict mapping the filenames to add to their contents.
+        :param removed:
+            The filenames to remove.
+        """
+        srcdir = path(self.srcdir)
+        if not isinstance(changed, dict):
+            changed = {name: None for name in changed}
+        for name, content in dict(changed, **(added or {})).items():
+            filename = srcdir / name
+            if content is None:
+                content = filename.read_bytes()
+            if not filename.dirname().isdir():
+                filename.dirname().makedirs()
+            if isinstance(content, bytes):
+                filename.write_bytes(content)
+            else:
+                filename.write_text(content, encoding='utf-8')
+        for name in removed:
+            (srcdir / name).unlink()
+
+        # collected in the main process; source-read is emitted in the
+        # worker processes on parallel reads
+        reread = set()
+        listener_id = self.connect('env-before-read-docs',
+                                   lambda app, env, docnames:
+                                   reread.update(docnames))
+        try:
+            before = self.snapshot()
+            started = perf_counter()
+            self.build()
+            elapsed = perf_counter() - started
+            diff = before.diff(self.snapshot())
+        finally:
+            self.disconnect(listener_id)
+
+        return RebuildResult(reread, diff.changed, diff.removed, elapsed)
+
+    def snapshot(self):
+        """
+        Returns a :class:`~sphinx_testing.snapshot.TreeSnapshot` of outdir.
+        Compare two snapshots to know the outputs changed by a build::
+
+            before = app.snapshot()
+            app.build()
+            diff = before.diff(app.snapshot())
+        """
+        return TreeSnapshot.take(self.outdir)
+
+    def _save_state(self):
+        """
+        Returns copies of the event listeners and the config values to be
+        restored by :meth:`reset`.
+        """
+        listeners = {name: copy(handlers) for name, handlers
+                     in self.events.listeners.items()}
+        config = {name: _copy_value(value) for name, value
+                  in vars(self.config).items()}
+        return listeners, config
+
+    def _restore_state(self, state):
+        listeners, config = state
+        self.events.listeners.clear()
+        for name, handlers in listeners.items():
+            self.events.listeners[name] = copy(handlers)
+
+        values = vars(self.config)
+        values.clear()
+        for name, value in config.items():
+            values[name] = _copy_value(value)
+
+    def reset(self):
+        """
+        Resets the app to the state just after its construction; restores
+        the event listeners and the config values, and clears the build
+        environment, the output directories and the captured status and
+        warning streams.
+        """
+        self._restore_state(self._initial_state)
+        for tree in (self.outdir, self.doctreedir):
+            tree = path(tree)
+            if tree.exists():
+                tree.rmtree()
+            tree.makedirs()
+
+        for stream in (self._status, self._warning):
+            if getattr(stream, 'seekable', lambda: False)():
+                stream.seek(0)
+            if hasattr(stream, 'truncate'):
+                stream.truncate(0)
+
+        self.statuscode = 0
+        self._warncount = 0
+        self.timings.clear()
+        if self.event_profile is not None:
+            self.event_profile.clear()
+
+        try:
+            from sphinx.util import logging
+            try:
+                logging.setup(self, self._status, self._warning,
+                              verbosity=self.verbosity)
+            except TypeError:
+                # workaround for Sphinx-7.x and older versions
+                logging.setup(self, self._status, self._warning)
+        except ImportError:
+            pass  # Sphinx-1.5 and older versions write the streams directly
+
+        self._reload_env(freshenv=True)
+
     def cleanup(self, error=None):
         if error and self.cleanup_on_errors is False:
+            if self.leak_check:
+                self.leak_check.cancel()
             return
 
-        if sphinx_version < '1.6':
-            from sphinx.theming import Theme
-            Theme.themes.clear()
+        with self.timer('cleanup'):
+            if self._registry_state is not None:
+                restore_registries(self._registry_state)
+                self._registry_state = None
 
-        try:
-            from sphinx.ext.autodoc import AutoDirective
-            AutoDirective._registry.clear()
-        except ImportError:
-            pass  # Sphinx-2.0+ does not have AutoDirective and its cache
+            for tree in self.cleanup_trees:
+                rmtree(tree, deferred=self.deferred_cleanup)
+
+        if self.leak_check and error:
+            self.leak_check.cancel()
+        elif self.leak_check:
+            # the environment is released not to be counted as retained
+            self.env = self.builder.env = None
+            self.release_logging()
+            self.leak_check.stop()
+            self.leak_check.check()
+
+    def release_logging(self):
+        """
+        Removes the logging handlers of Sphinx referring to the app, which
+        keep it alive until the next app is made.
+        """
+        import logging
+
+        def refers(handler):
+            objects = list(handler.filters) + [getattr(handler, 'stream',
+                                                       None)]
+            for obj in objects:
+                # workaround for Sphinx-7.x and older versions; ``app``
+                if self in (getattr(obj, '_app', None),
+                            getattr(obj, 'app', None)):
+                    return True
+            return False
 
-        for tree in self.cleanup_trees:
-            shutil.rmtree(tree, True)
+        logger = logging.getLogger('sphinx')
+        for handler in logger.handlers[:]:
+            if refers(handler):
+                logger.removeHandler(handler)
 
 
 class with_app(object):
     """
     Make a TestApp with args and kwargs, pass it to the test and clean up
     properly.
+
+    If `reuse` is given, the TestApp is taken from a :class:`AppPool` (the
+    default pool if ``True``) and returned to it after the test instead of
+    being cleaned up.
+
+    If `timings_file` (or ``$SPHINX_TESTING_TIMINGS``) is given, the timings
+    of the TestApp are appended to the file as JSON lines per test.
+
+    If `structured_capture` is ``True``, the status is captured into
+    a bounded :class:`~sphinx_testing.capture.RingBuffer` and the warnings
+    are parsed into a :class:`~sphinx_testing.capture.WarningLog`.
+
+    If `perf_baseline` (or ``$SPHINX_TESTING_PERF_BASELINE``) is given, the
+    build time and the peak RSS of the test are compared with the baseline
+    file (see :class:`~sphinx_testing.perf.PerfBaseline`).
+
+    If `leak_check` (or ``$SPHINX_TESTING_LEAK_CHECK``) is given, the
+    :class:`~sphinx_testing.leak.LeakCheck` of the last run is available as
+    ``leak_check`` attribute of the decorated function.  Its report is
+    written to stderr unless it has a threshold to check.
     """
 
     def __init__(self, *sphinxargs, **sphinxkwargs):
         self.sphinxargs = sphinxargs
         self.sphinxkwargs = sphinxkwargs
 
+        self._reuse = sphinxkwargs.pop('reuse', False)
+        self._timings_file = sphinxkwargs.pop(
+            'timings_file', os.environ.get('SPHINX_TESTING_TIMINGS'))
+        self._structured_capture = sphinxkwargs.pop('structured_capture',
+                                                    False)
+        self._perf_baseline = get_perf_baseline(
+            sphinxkwargs.pop('perf_baseline', None))
+
+        self.leak_check = None
         self._write_docstring = sphinxkwargs.pop('write_docstring', False)
         if self._write_docstring:
-            self.sphinxkwargs['copy_srcdir_to_tmpdir'] = True
+            if not self.sphinxkwargs.get('copy_srcdir_to_tmpdir'):
+                self.sphinxkwargs['copy_srcdir_to_tmpdir'] = True
+
+    @property
+    def pool(self):
+        from sphinx_testing.pool import AppPool, default_pool
+        if isinstance(self._reuse, AppPool):
+            return self._reuse
+        else:
+            return default_pool
 
     def write_docstring(self, app, docstring):
         if self._write_docstring:
-            if self._write_docstring is True:
-                if isinstance(app.config.source_suffix, (list, tuple)):
-                    source_suffix = app.config.source_suffix[0]
-                elif isinstance(app.config.source_suffix, dict):
-                    source_suffix = list(app.config.source_suffix)[0]
+            with app.timer('write_docstring'):
+                if self._write_docstring is True:
+                    if isinstance(app.config.source_suffix, (list, tuple)):
+                        source_suffix = app.config.source_suffix[0]
+                    elif isinstance(app.config.source_suffix, dict):
+                        source_suffix = list(app.config.source_suffix)[0]
+                    else:
+                        source_suffix = app.config.source_suffix
+                    basename = '%s%s' % (app.config.master_doc, source_suffix)
+                    filename = path(app.srcdir) / basename
                 else:
-                    source_suffix = app.config.source_suffix
-                basename = '%s%s' % (app.config.master_doc, source_suffix)
-                filename = app.srcdir / basename
-            else:
-                filename = app.srcdir / self._write_docstring
+                    filename = path(app.srcdir) / self._write_docstring
 
-            filename.write_text(dedent(docstring), encoding='utf-8')
+                filename.write_text(dedent(docstring), encoding='utf-8')
 
     def __call__(self, func):
         @wraps(func)
         def decorator(*args, **kwargs):
-            app = None
-            exc = None
-            sphinxkwargs = dict(self.sphinxkwargs)  # create copy
+            try:
+                return self.measure(func, args, kwargs)
+            finally:
+                decorator.leak_check = self.leak_check
+
+        decorator.leak_check = None
+        return decorator
+
+    def measure(self, func, args, kwargs):
+        if self._perf_baseline is None:
+            return self.run(func, args, kwargs)
+
+        measurements = []
+        for _ in range(max(self._perf_baseline.repeat, 1)):
+            result = self.run(func, args, kwargs, measurements)
+
+        sphinxkwargs = signature(TestApp.__init__).bind(
+            None, *self.sphinxargs, **self.sphinxkwargs).arguments
+        self._perf_baseline.check(
+            '%s.%s' % (func.__module__, func.__qualname__), measurements,
+            sphinxkwargs.get('srcdir') or 'create_new_srcdir',
+            sphinxkwargs.get('buildername', 'html'),
+            sphinxkwargs.get('confoverrides'))
+        return result
+
+    def run(self, func, args, kwargs, measurements=None):
+        app = None
+        exc = None
+        leak_check = None
+        sphinxkwargs = dict(self.sphinxkwargs)  # create copy
+        try:
             with docutils_namespace():
                 try:
-                    status = sphinxkwargs.setdefault('status', StringIO())
-                    warning = sphinxkwargs.setdefault('warning', StringIO())
-                    app = TestApp(*self.sphinxargs, **sphinxkwargs)
+                    if measurements is not None:
+                        reset_peak_rss()
+                        rss = current_rss()
+
+                    if self._reuse:
+                        app = self.pool.acquire(*self.sphinxargs,
+                                                **sphinxkwargs)
+                        status, warning = app._status, app._warning
+                    else:
+                        if self._structured_capture:
+                            from sphinx_testing.capture import (
+                                RingBuffer, WarningLog
+                            )
+                            sphinxkwargs.setdefault('status', RingBuffer())
+                            sphinxkwargs.setdefault('warning', WarningLog())
+                        status = sphinxkwargs.setdefault('status', StringIO())
+                        warning = sphinxkwargs.setdefault('warning',
+                                                          StringIO())
+                        app = TestApp(*self.sphinxargs, **sphinxkwargs)
                     self.write_docstring(app, func.__doc__)
 
-                    return func(*(args + (app, status, warning)), **kwargs)
+                    result = func(*(args + (app, status, warning)), **kwargs)
                 except Exception as _exc:
                     exc = _exc
                     raise
                 finally:
-                    if app:
+                    if app and measurements is not None and not exc:
+                        if 'build' in app.timings:
+                            growth = max(peak_rss() - rss, 0)
+                            measurements.append((app.timings['build'],
+                                                 growth))
+
+                    if app and self._reuse:
+                        self.pool.release(app, error=exc)
+                    elif app:
                         if exc:
                             app.cleanup(error=exc)
                         else:
+                            # measured after the app is released
+                            leak_check, app.leak_check = app.leak_check, None
                             app.cleanup()
-        return decorator
+                            if leak_check:
+                                app.release_logging()
+
+                    if app and self._timings_file:
+                        test = '%s.%s' % (func.__module__, func.__qualname__)
+                        app.export_timings(self._timings_file, test=test)
+                    app = None
+        except BaseException:
+            if leak_check:
+                leak_check.cancel()
+            raise
+
+        if leak_check:
+            leak_check.stop()
+            self.leak_check = leak_check
+            if leak_check.threshold is None:
+                sys.stderr.write('%s.%s: %s\n' % (func.__module__,
+                                                  func.__qualname__,
+                                                  leak_check.report()))
+            leak_check.check()
+        return result
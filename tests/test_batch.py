@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from sphinx_testing.batch import BuildResult, build_app, run_builds
+from sphinx_testing.path import path
+
+
+class TestBatch(unittest.TestCase):
+    def test_build_app(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        try:
+            result = build_app(dict(srcdir=srcdir, buildername='text'))
+            self.assertIsInstance(result, BuildResult)
+            self.assertIsNone(result.exception)
+            self.assertIn('build succeeded', result.status)
+            self.assertIn('index.txt', os.listdir(result.outdir))
+        finally:
+            result.cleanup()
+
+        self.assertFalse(result.outdir.exists())
+
+    def test_build_app_with_errors(self):
+        result = build_app(dict(srcdir='/path/to/unknown'))
+        self.assertIsNotNone(result.exception)
+        self.assertIn('Traceback', result.traceback)
+        self.assertEqual([], result.cleanup_trees)
+
+    def test_build_app_with_errors_when_cleanup_on_errors(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        try:
+            result = build_app(dict(srcdir=srcdir, cleanup_on_errors=False,
+                                    confoverrides={'master_doc': 1}))
+            self.assertIsNotNone(result.exception)
+            self.assertNotEqual([], result.cleanup_trees)
+            self.assertTrue(os.path.exists(result.cleanup_trees[0]))
+        finally:
+            result.cleanup()
+
+    def test_run_builds(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        argsets = [dict(srcdir=srcdir, buildername='html'),
+                   dict(srcdir=srcdir, buildername='text'),
+                   dict(srcdir='/path/to/unknown')]
+        results = run_builds(argsets, max_workers=2)
+        try:
+            self.assertEqual(3, len(results))
+            self.assertIn('index.html', os.listdir(results[0].outdir))
+            self.assertIn('index.txt', os.listdir(results[1].outdir))
+            self.assertIsNone(results[0].exception)
+            self.assertIsNotNone(results[2].exception)
+        finally:
+            for result in results:
+                result.cleanup()
+
+        with self.assertRaises(AssertionError):
+            run_builds([dict(srcdir=srcdir, status=None)])
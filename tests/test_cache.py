@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from io import StringIO
+from sphinx_testing import with_tmpdir
+from sphinx_testing.cache import BuildCache, get_build_cache, tree_digest
+from sphinx_testing.path import path
+from sphinx_testing.util import TestApp
+
+
+class TestBuildCache(unittest.TestCase):
+    @with_tmpdir
+    def test_tree_digest(self, tmpdir):
+        srcdir = path(__file__).dirname() / 'examples'
+        (srcdir).copytree(tmpdir / 'root')
+        self.assertEqual(tree_digest(srcdir), tree_digest(tmpdir / 'root'))
+
+        # build directory is ignored
+        (tmpdir / 'root' / '_build').makedirs()
+        (tmpdir / 'root' / '_build' / 'index.html').write_text('')
+        self.assertEqual(tree_digest(srcdir), tree_digest(tmpdir / 'root'))
+
+        (tmpdir / 'root' / 'index.rst').write_text('Hello world')
+        self.assertNotEqual(tree_digest(srcdir),
+                            tree_digest(tmpdir / 'root'))
+
+    @with_tmpdir
+    def test_make_key(self, tmpdir):
+        srcdir = path(__file__).dirname() / 'examples'
+        cache = BuildCache(tmpdir)
+        key = cache.make_key(srcdir, 'html', {'master_doc': 'index'})
+        self.assertEqual(key, cache.make_key(srcdir, 'html',
+                                             {'master_doc': 'index'}))
+        self.assertNotEqual(key, cache.make_key(srcdir, 'text',
+                                                {'master_doc': 'index'}))
+        self.assertNotEqual(key, cache.make_key(srcdir, 'html', {}))
+        self.assertNotEqual(key, cache.make_key(srcdir, 'html',
+                                                {'master_doc': 'index'},
+                                                verbosity=1))
+
+    def test_get_build_cache(self):
+        self.assertIsNone(get_build_cache(False))
+
+    @with_tmpdir
+    def test_TestApp_with_build_cache(self, tmpdir):
+        srcdir = path(__file__).dirname() / 'examples'
+        cache = BuildCache(tmpdir / 'cache')
+
+        # cache miss
+        try:
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                          build_cache=cache)
+            (app.srcdir / 'unknown.rst').write_text('')
+            app.build()
+            self.assertIn('index.html', os.listdir(app.outdir))
+            self.assertEqual(1, len(os.listdir(cache.cachedir)))
+        finally:
+            app.cleanup()
+
+        try:
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                          build_cache=cache)
+            self.assertEqual([], os.listdir(app.outdir))
+            app.build()
+            self.assertIn('index.html', os.listdir(app.outdir))
+            self.assertNotIn('unknown.html', os.listdir(app.outdir))
+            self.assertEqual(2, len(os.listdir(cache.cachedir)))
+        finally:
+            app.cleanup()
+
+        # cache hit
+        try:
+            warning = StringIO()
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                          build_cache=cache, warning=warning)
+            app.build()
+            self.assertIn('index.html', os.listdir(app.outdir))
+            self.assertIn('0 source files that are out of date',
+                          app._status.getvalue())
+        finally:
+            app.cleanup()
+
+        # disabled
+        try:
+            app = TestApp(srcdir=srcdir, build_cache=False)
+            self.assertEqual([], os.listdir(app.outdir))
+        finally:
+            app.cleanup()
+
+    @with_tmpdir
+    def test_TestApp_modified_after_construction(self, tmpdir):
+        srcdir = tmpdir / 'root'
+        (path(__file__).dirname() / 'examples').copytree(srcdir)
+        (srcdir / 'index.rst').write_text('.. unknown-directive::\n')
+        cache = BuildCache(tmpdir / 'cache')
+
+        try:
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                          build_cache=cache)
+            app.build()
+            self.assertIn('Unknown directive', app._warning.getvalue())
+            self.assertEqual(1, len(os.listdir(cache.cachedir)))
+        finally:
+            app.cleanup()
+
+        # the source is fixed after the construction of the app
+        try:
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                          build_cache=cache)
+            (app.srcdir / 'index.rst').write_text('Hello world\n')
+            app.build()
+            self.assertNotIn('Unknown directive', app._warning.getvalue())
+            html = (app.outdir / 'index.html').read_bytes()
+            self.assertIn(b'Hello world', html)
+        finally:
+            app.cleanup()
+
+        # the original source is restored from the cache
+        try:
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                          build_cache=cache)
+            app.build()
+            self.assertIn('0 source files that are out of date',
+                          app._status.getvalue())
+            self.assertIn('Unknown directive', app._warning.getvalue())
+
+            # the warnings refer to the srcdir of the app
+            self.assertIn(os.path.join(app.srcdir, 'index.rst:'),
+                          app._warning.getvalue())
+        finally:
+            app.cleanup()
+
+    @with_tmpdir
+    def test_TestApp_with_warningiserror(self, tmpdir):
+        srcdir = tmpdir / 'root'
+        (path(__file__).dirname() / 'examples').copytree(srcdir)
+        (srcdir / 'index.rst').write_text('.. unknown-directive::\n')
+        cache = BuildCache(tmpdir / 'cache')
+
+        try:
+            app = TestApp(srcdir=srcdir, build_cache=cache)
+            app.build()
+            self.assertEqual(1, len(os.listdir(cache.cachedir)))
+        finally:
+            app.cleanup()
+
+        try:
+            app = TestApp(srcdir=srcdir, build_cache=cache,
+                          warningiserror=True)
+            self.assertIsNone(app.build_cache)
+            try:
+                app.build()
+            except Exception:
+                pass  # raised by some versions of Sphinx
+            self.assertEqual(1, app.statuscode)
+        finally:
+            app.cleanup()
+
+    @with_tmpdir
+    def test_evict(self, tmpdir):
+        srcdir = path(__file__).dirname() / 'examples'
+        cache = BuildCache(tmpdir / 'cache', maxsize=0)
+
+        try:
+            app = TestApp(srcdir=srcdir, build_cache=cache)
+            app.build()
+            self.assertEqual([], os.listdir(cache.cachedir))
+        finally:
+            app.cleanup()
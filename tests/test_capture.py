@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from sphinx_testing.capture import (
+    RingBuffer, SpoolBuffer, WarningLog, WarningRecord
+)
+from sphinx_testing.path import path
+from sphinx_testing.util import with_app
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_write(self):
+        buf = RingBuffer(maxlines=2)
+        buf.write('line1\nline2\nli')
+        self.assertEqual('line1\nline2\nli', buf.getvalue())
+
+        buf.write('ne3\nline4')
+        self.assertEqual('line2\nline3\nline4', buf.getvalue())
+
+        buf.truncate(0)
+        self.assertEqual('', buf.getvalue())
+
+
+class TestSpoolBuffer(unittest.TestCase):
+    def test_write(self):
+        buf = SpoolBuffer(max_size=10)
+        try:
+            buf.write('hello ')
+            self.assertFalse(buf.spilled)
+            buf.write('world\n')
+            self.assertTrue(buf.spilled)
+            self.assertEqual('hello world\n', buf.getvalue())
+
+            buf.write('!')
+            self.assertEqual('hello world\n!', buf.getvalue())
+
+            buf.truncate(0)
+            self.assertEqual('', buf.getvalue())
+        finally:
+            buf.close()
+
+
+class TestWarningLog(unittest.TestCase):
+    def test_write(self):
+        log = WarningLog(srcdir='/path/to/src')
+        log.write('/path/to/src/index.rst:3: WARNING: Title underline too '
+                  'short.\n')
+        log.write('\nHello\n====\n')
+        log.write('/path/to/src/sub/doc.rst: WARNING: document isn\'t '
+                  'included in any toctree [toc.not_included]\n')
+        log.write('WARNING: html_static_path entry \'_static\' does not '
+                  'exist [config]\n')
+        log.write('/path/to/other.rst:1: ERROR: Unknown directive type.\n')
+
+        self.assertEqual(4, len(log))
+        record = log.records[0]
+        self.assertIsInstance(record, WarningRecord)
+        self.assertEqual('index', record.docname)
+        self.assertEqual(3, record.lineno)
+        self.assertEqual('WARNING', record.level)
+        self.assertEqual('Title underline too short.\n\nHello\n====',
+                         record.message)
+        self.assertIsNone(record.type)
+
+        record = log.records[1]
+        self.assertEqual('sub/doc', record.docname)
+        self.assertIsNone(record.lineno)
+        self.assertEqual('toc', record.type)
+        self.assertEqual('not_included', record.subtype)
+        self.assertEqual("document isn't included in any toctree",
+                         record.message)
+
+        record = log.records[2]
+        self.assertIsNone(record.docname)
+        self.assertEqual('config', record.type)
+        self.assertIsNone(record.subtype)
+
+        record = log.records[3]
+        self.assertIsNone(record.docname)
+        self.assertEqual('/path/to/other.rst:1', record.location)
+        self.assertEqual('ERROR', record.level)
+
+        self.assertEqual([log.records[0]], log.for_doc('index'))
+        self.assertEqual([log.records[1]], log.for_doc('sub/doc'))
+        self.assertEqual([], log.for_doc('unknown'))
+        self.assertEqual([log.records[1]], log.for_type('toc'))
+        self.assertEqual([log.records[1]],
+                         log.for_type('toc', 'not_included'))
+        self.assertEqual([], log.for_type('toc', 'circular'))
+        self.assertIn('Title underline too short.\n\nHello\n====\n',
+                      log.getvalue())
+
+        log.truncate(0)
+        self.assertEqual(0, len(log))
+        self.assertEqual('', log.getvalue())
+
+    def test_write_multiline_with_type(self):
+        log = WarningLog(srcdir='/path/to/src')
+        log.write('/path/to/src/index.rst:5: ERROR: Unknown directive type '
+                  '"foo".\n')
+        log.write('\n.. foo:: bar [docutils]\n')
+
+        self.assertEqual(1, len(log))
+        record = log.records[0]
+        self.assertEqual('docutils', record.type)
+        self.assertIsNone(record.subtype)
+        self.assertEqual('Unknown directive type "foo".\n\n.. foo:: bar',
+                         record.message)
+        self.assertEqual([record], log.for_type('docutils'))
+        self.assertEqual([], log.for_type(None))
+
+    def test_with_app(self):
+        srcdir = path(__file__).dirname() / 'examples'
+
+        @with_app(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                  structured_capture=True)
+        def execute(app, status, warning):
+            (app.srcdir / 'unknown.rst').write_text('')
+            app.build()
+
+            self.assertIsInstance(status, RingBuffer)
+            self.assertIsInstance(warning, WarningLog)
+            self.assertIn('build succeeded', status.getvalue())
+            self.assertIn("document isn't included in any toctree",
+                          warning.getvalue())
+            self.assertEqual(1, len(warning.for_doc('unknown')))
+
+        execute()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+from sphinx_testing.path import path
+from sphinx_testing.forkserver import ForkServer
+from sphinx_testing.tmpdir import mkdtemp
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork()')
+class TestForkServer(unittest.TestCase):
+    def test_run(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        with ForkServer(extensions=['sphinx.ext.todo']) as server:
+            self.assertIsNotNone(server.pid)
+            try:
+                result1 = server.run(srcdir=srcdir)
+                result2 = server.run(srcdir=srcdir, buildername='text')
+                result3 = server.run(srcdir='/path/to/unknown')
+
+                self.assertIsNone(result1.exception)
+                self.assertIn('build succeeded', result1.status)
+                self.assertIn('index.html', os.listdir(result1.outdir))
+                self.assertIn('index.txt', os.listdir(result2.outdir))
+                self.assertIsNotNone(result3.exception)
+            finally:
+                for result in (result1, result2, result3):
+                    result.cleanup()
+
+        self.assertIsNone(server.pid)
+
+    def test_build_in_child_process(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        with ForkServer(extensions=['sphinx.ext.ifconfig']) as server:
+            confoverrides = {'extensions': ['sphinx.ext.ifconfig']}
+            result = server.run(srcdir=srcdir, confoverrides=confoverrides)
+            result.cleanup()
+
+        # extensions are loaded only in the server and its children
+        self.assertIsNone(result.exception)
+        self.assertNotIn('sphinx.ext.ifconfig', sys.modules)
+
+    def test_run_with_base_exception(self):
+        tmpdir = mkdtemp()
+        try:
+            (tmpdir / 'conf.py').write_text('raise KeyboardInterrupt\n')
+            with ForkServer() as server:
+                result = server.run(srcdir=tmpdir)
+                self.assertIsInstance(result.exception, RuntimeError)
+                self.assertIn('exited with status', str(result.exception))
+
+                # the server is still available
+                srcdir = path(__file__).dirname() / 'examples'
+                result = server.run(srcdir=srcdir)
+                result.cleanup()
+                self.assertIsNone(result.exception)
+        finally:
+            tmpdir.rmtree()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from unittest.mock import patch
+from sphinx_testing import with_tmpdir
+from sphinx_testing.generator import generate_root, generate_spec
+from sphinx_testing.spec import flatten_spec, spec_digest
+from sphinx_testing.util import TestApp, docutils_namespace
+
+
+class TestGenerator(unittest.TestCase):
+    def test_generate_spec(self):
+        spec = generate_spec(documents=20, depth=2, images=2, autodoc=3,
+                             seed=1)
+        self.assertEqual(spec, generate_spec(documents=20, depth=2, images=2,
+                                             autodoc=3, seed=1))
+        self.assertNotEqual(spec_digest(flatten_spec(spec)),
+                            spec_digest(flatten_spec(generate_spec(
+                                documents=20, depth=2, images=2, autodoc=3,
+                                seed=2))))
+
+        docs = [name for name in spec if name.endswith('.rst')]
+        self.assertEqual(21, len(docs))  # including index
+        self.assertEqual(2, len([name for name in spec
+                                 if name.endswith('.png')]))
+        modules = [name for name in spec if name.startswith('synthetic_')]
+        self.assertEqual(1, len(modules))
+        self.assertNotIn(modules[0], generate_spec(documents=20, autodoc=3))
+        self.assertIn("'sphinx.ext.autodoc'", spec['conf.py'])
+
+        # the toctree of index has ceil(sqrt(20)) entries
+        toctree = spec['index.rst'].split('.. toctree::')[1]
+        self.assertEqual(5, len(toctree.split()))
+
+    @with_tmpdir
+    def test_generate_root(self, tmpdir):
+        generate_root(tmpdir / 'root', documents=10, seed=1)
+        self.assertEqual(12, len(os.listdir(tmpdir / 'root')))
+
+    @with_tmpdir
+    def test_build(self, tmpdir):
+        spec = generate_spec(documents=10, depth=3, xrefs=3, images=2,
+                             autodoc=2)
+        with patch.dict(os.environ, SPHINX_TESTING_TREE_CACHE=tmpdir):
+            with docutils_namespace():
+                app = TestApp(create_new_srcdir=spec)
+                try:
+                    app.build()
+                    # no warnings for the generated documents
+                    self.assertNotIn('.rst', app._warning.getvalue())
+                    self.assertIn('doc00009.html', os.listdir(app.outdir))
+                    self.assertEqual(2,
+                                     len(os.listdir(app.outdir / '_images')))
+                finally:
+                    app.cleanup()
+
+    @with_tmpdir
+    def test_build_roots_in_same_process(self, tmpdir):
+        with patch.dict(os.environ, SPHINX_TESTING_TREE_CACHE=tmpdir):
+            for documents, autodoc in ((20, 2), (40, 6)):
+                spec = generate_spec(documents=documents, autodoc=autodoc)
+                with docutils_namespace():
+                    app = TestApp(create_new_srcdir=spec)
+                    try:
+                        app.build()
+                        self.assertNotIn('failed to import',
+                                         app._warning.getvalue())
+                    finally:
+                        app.cleanup()
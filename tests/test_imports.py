@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+import subprocess
+
+
+def import_modules(statement):
+    """
+    Runs `statement` with ``-X importtime`` in a new interpreter and returns
+    the names of the imported modules.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    command = [sys.executable, '-X', 'importtime', '-c', statement]
+    proc = subprocess.run(command, env=env, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            modules.append(line.split('|')[-1].strip())
+    return modules
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'requires module __getattr__')
+class TestImports(unittest.TestCase):
+    def test_import_sphinx_testing(self):
+        modules = import_modules('import sphinx_testing')
+        self.assertIn('sphinx_testing.tmpdir', modules)
+        for name in ('sphinx', 'docutils', 'jinja2'):
+            self.assertNotIn(name, modules)
+        self.assertNotIn('sphinx_testing.util', modules)
+
+    def test_import_path_and_tmpdir(self):
+        modules = import_modules('from sphinx_testing import mkdtemp, '
+                                 'with_tmpdir; '
+                                 'from sphinx_testing.path import path')
+        self.assertNotIn('sphinx', modules)
+
+    def test_lazy_attributes(self):
+        modules = import_modules('from sphinx_testing import TestApp')
+        self.assertIn('sphinx.application', modules)
+
+        import sphinx_testing
+        from sphinx_testing.util import TestApp, with_app
+        self.assertIs(TestApp, sphinx_testing.TestApp)
+        self.assertIs(with_app, sphinx_testing.with_app)
+        self.assertIn('TestApp', dir(sphinx_testing))
+
+        with self.assertRaises(AttributeError):
+            sphinx_testing.unknown
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import tracemalloc
+import unittest
+import weakref
+from io import StringIO
+from unittest.mock import patch
+from sphinx_testing.leak import LeakCheck, MemoryLeak
+from sphinx_testing.path import path
+from sphinx_testing.tmpdir import mkdtemp
+from sphinx_testing.util import TestApp, docutils_namespace, with_app
+
+leaked = []
+
+
+class TestLeakCheck(unittest.TestCase):
+    def tearDown(self):
+        del leaked[:]
+
+    def test_leak_check(self):
+        check = LeakCheck(threshold=1024 * 1024)
+        check.start()
+        leaked.append(bytearray(4 * 1024 * 1024))
+        leaked.extend([i] for i in range(1000))
+        check.stop()
+
+        self.assertGreater(check.retained, 4 * 1024 * 1024)
+        self.assertGreaterEqual(check.objects, 1000)
+        report = check.report()
+        self.assertTrue(report.startswith('retained 4.'))
+        self.assertIn('%s:' % __file__, report)
+        with self.assertRaises(MemoryLeak):
+            check.check()
+
+        check.stop()  # no effect if not started
+
+    def test_TestApp(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        with docutils_namespace():
+            app = TestApp(srcdir=srcdir, leak_check=True)
+            app.build()
+            app.cleanup()
+
+        self.assertIsInstance(app.leak_check, LeakCheck)
+        self.assertIsNone(app.leak_check.threshold)
+        self.assertIn('retained', app.leak_check.report())
+
+    def test_with_app(self):
+        srcdir = path(__file__).dirname() / 'examples'
+
+        @with_app(srcdir=srcdir, leak_check=LeakCheck(threshold=1024 * 1024))
+        def execute(app, status, warning):
+            app.build()
+            leaked.append(bytearray(4 * 1024 * 1024))
+
+        with self.assertRaises(MemoryLeak) as cm:
+            execute()
+        self.assertIn(__file__, str(cm.exception))
+
+    def test_with_app_reports(self):
+        srcdir = path(__file__).dirname() / 'examples'
+
+        @with_app(srcdir=srcdir, leak_check=True)
+        def execute(app, status, warning):
+            app.build()
+
+        stderr = StringIO()
+        with patch('sys.stderr', stderr):
+            execute()
+        self.assertIsInstance(execute.leak_check, LeakCheck)
+        self.assertIn('retained', execute.leak_check.report())
+        self.assertIn('execute: retained', stderr.getvalue())
+
+    def test_with_app_measures_after_release(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        refs = []
+        released = []
+
+        class Check(LeakCheck):
+            def stop(self):
+                gc.collect()
+                released.append(refs[0]() is None)
+                super(Check, self).stop()
+
+        @with_app(srcdir=srcdir, leak_check=Check())
+        def execute(app, status, warning):
+            refs.append(weakref.ref(app))
+            app.build()
+
+        execute()
+        self.assertEqual([True], released)
+
+    def test_tracing_stopped_on_errors(self):
+        tmpdir = mkdtemp()
+        try:
+            (tmpdir / 'conf.py').write_text('raise RuntimeError\n')
+            with self.assertRaises(Exception):
+                TestApp(srcdir=tmpdir, leak_check=True)
+            self.assertFalse(tracemalloc.is_tracing())
+        finally:
+            tmpdir.rmtree()
+
+        srcdir = path(__file__).dirname() / 'examples'
+        with docutils_namespace():
+            app = TestApp(srcdir=srcdir, leak_check=True,
+                          cleanup_on_errors=False)
+            self.assertTrue(tracemalloc.is_tracing())
+            app.cleanup(error=Exception())
+            self.assertFalse(tracemalloc.is_tracing())
+            app.cleanup()
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
+import mmap
 import shutil
 import unittest
 from tempfile import mkdtemp
 from sphinx_testing import with_tmpdir
-from sphinx_testing.path import path
+from sphinx_testing.path import MMAP_THRESHOLD, path, _cow_roots
 
 
 class TestPath(unittest.TestCase):
@@ -133,6 +135,127 @@ class TestPath(unittest.TestCase):
         self.assertTrue(os.path.isfile("%s/test.symlink" % dstdir))
         self.assertTrue(os.path.islink("%s/test.symlink" % dstdir))
 
+    @with_tmpdir
+    def test_clonetree(self, tmpdir):
+        subdir = mkdtemp(dir=tmpdir)
+        subsubdir = "%s/subdir" % subdir
+        filename = "%s/test.file" % subdir
+        os.makedirs(subsubdir)
+        with open(filename, 'wb') as fd:
+            fd.write(b'hello world')
+        open("%s/test2.file" % subsubdir, 'w').close()  # create empty file
+
+        dstdir = os.path.join(tmpdir, "path/to/dstdir")
+        path(subdir).clonetree(dstdir)
+        self.assertTrue(os.path.isdir("%s/subdir" % dstdir))
+        self.assertTrue(os.path.isfile("%s/subdir/test2.file" % dstdir))
+        self.assertEqual(b'hello world',
+                         path("%s/test.file" % dstdir).read_bytes())
+
+        # writing to the cloned file does not affect the original
+        path("%s/test.file" % dstdir).write_bytes(b'goodbye')
+        self.assertEqual(b'goodbye',
+                         path("%s/test.file" % dstdir).read_bytes())
+        self.assertEqual(b'hello world', path(filename).read_bytes())
+        self.assertEqual(1, os.stat(filename).st_nlink)
+
+        # appending to the cloned file keeps its content
+        dstdir = os.path.join(tmpdir, "path/to/dstdir2")
+        path(subdir).clonetree(dstdir)
+        path("%s/test.file" % dstdir).write_bytes(b'!', append=True)
+        self.assertEqual(b'hello world!',
+                         path("%s/test.file" % dstdir).read_bytes())
+        self.assertEqual(b'hello world', path(filename).read_bytes())
+
+        path("%s/test.file" % dstdir).write_text('goodbye')
+        self.assertEqual(b'hello world', path(filename).read_bytes())
+
+        # the removed trees are forgotten
+        self.assertIn(dstdir, _cow_roots)
+        path(os.path.join(tmpdir, "path")).rmtree()
+        self.assertNotIn(dstdir, _cow_roots)
+
+    @with_tmpdir
+    def test_clonetree_with_copied_files(self, tmpdir):
+        subdir = path(mkdtemp(dir=tmpdir))
+        (subdir / '_build' / 'html').makedirs()
+        (subdir / '_build' / 'html' / 'index.html').write_bytes(b'original')
+        (subdir / 'locale').makedirs()
+        (subdir / 'locale' / 'ja.mo').write_bytes(b'original')
+        (subdir / 'index.rst').write_bytes(b'original')
+
+        dstdir = path(tmpdir) / 'dstdir'
+        subdir.clonetree(dstdir)
+        for name in ('_build/html/index.html', 'locale/ja.mo'):
+            self.assertEqual(1, os.stat(subdir / name).st_nlink)
+            with open(dstdir / name, 'wb') as fd:  # not through path
+                fd.write(b'modified')
+            self.assertEqual(b'original', (subdir / name).read_bytes())
+
+        # other files can also be copied
+        dstdir = path(tmpdir) / 'dstdir2'
+        subdir.clonetree(dstdir, copy=('*.rst',))
+        with open(dstdir / 'index.rst', 'wb') as fd:
+            fd.write(b'modified')
+        self.assertEqual(b'original', (subdir / 'index.rst').read_bytes())
+
+    @with_tmpdir
+    def test_overlaytree(self, tmpdir):
+        subdir = mkdtemp(dir=tmpdir)
+        subsubdir = "%s/subdir" % subdir
+        filename = "%s/test.file" % subdir
+        os.makedirs(subsubdir)
+        with open(filename, 'wb') as fd:
+            fd.write(b'hello world')
+        open("%s/test2.file" % subsubdir, 'w').close()  # create empty file
+
+        dstdir = os.path.join(tmpdir, "path/to/dstdir")
+        path(subdir).overlaytree(dstdir)
+        self.assertTrue(os.path.isdir("%s/subdir" % dstdir))
+        self.assertFalse(os.path.islink("%s/subdir" % dstdir))
+        self.assertTrue(os.path.isfile("%s/subdir/test2.file" % dstdir))
+        self.assertTrue(os.path.islink("%s/test.file" % dstdir))
+        self.assertEqual(b'hello world',
+                         path("%s/test.file" % dstdir).read_bytes())
+
+        # writing to the overlaid file does not affect the original
+        path("%s/test.file" % dstdir).write_text('goodbye')
+        self.assertFalse(os.path.islink("%s/test.file" % dstdir))
+        self.assertEqual(b'goodbye',
+                         path("%s/test.file" % dstdir).read_bytes())
+        self.assertEqual(b'hello world', path(filename).read_bytes())
+
+        # appending to the overlaid file keeps its content
+        dstdir = os.path.join(tmpdir, "path/to/dstdir2")
+        path(subdir).overlaytree(dstdir)
+        path("%s/test.file" % dstdir).write_bytes(b'!', append=True)
+        self.assertEqual(b'hello world!',
+                         path("%s/test.file" % dstdir).read_bytes())
+        self.assertEqual(b'hello world', path(filename).read_bytes())
+
+        # removing the overlay keeps the original
+        path(dstdir).rmtree()
+        self.assertEqual(b'hello world', path(filename).read_bytes())
+
+    @with_tmpdir
+    def test_overlaytree_with_copied_files(self, tmpdir):
+        subdir = path(mkdtemp(dir=tmpdir))
+        (subdir / '_build' / 'html').makedirs()
+        (subdir / '_build' / 'html' / 'index.html').write_bytes(b'original')
+        (subdir / 'locale').makedirs()
+        (subdir / 'locale' / 'ja.mo').write_bytes(b'original')
+
+        dstdir = path(tmpdir) / 'dstdir'
+        subdir.overlaytree(dstdir)
+        self.assertTrue((dstdir / '_build').isdir())
+        self.assertFalse((dstdir / '_build').islink())
+        self.assertEqual([], (dstdir / '_build').listdir())
+        self.assertFalse((dstdir / 'locale' / 'ja.mo').islink())
+        with open(dstdir / 'locale' / 'ja.mo', 'wb') as fd:  # not through path
+            fd.write(b'modified')
+        self.assertEqual(b'original',
+                         (subdir / 'locale' / 'ja.mo').read_bytes())
+
     @with_tmpdir
     def test_move(self, tmpdir):
         subdir = mkdtemp(dir=tmpdir)
@@ -194,6 +317,67 @@ class TestPath(unittest.TestCase):
         files = path(tmpdir).listdir()
         self.assertCountEqual(['subdir', 'test.file', 'test.symlink'], files)
 
+    @with_tmpdir
+    def test_walk(self, tmpdir):
+        tmpdir = path(tmpdir)
+        for name in ('subdir/_build/html', 'subdir/images'):
+            (tmpdir / name).makedirs()
+        for name in ('index.rst', 'subdir/doc.rst', 'subdir/images/a.png',
+                     'subdir/_build/html/index.html'):
+            (tmpdir / name).write_text('')
+
+        files = list(tmpdir.walk())
+        self.assertIsInstance(files[0], path)
+        self.assertCountEqual([tmpdir / 'index.rst',
+                               tmpdir / 'subdir/doc.rst',
+                               tmpdir / 'subdir/images/a.png',
+                               tmpdir / 'subdir/_build/html/index.html'],
+                              files)
+
+        # include and exclude
+        self.assertCountEqual([tmpdir / 'index.rst',
+                               tmpdir / 'subdir/doc.rst'],
+                              tmpdir.walk(include='*.rst'))
+        self.assertCountEqual([tmpdir / 'index.rst'],
+                              tmpdir.walk(include=['*.rst', '*.html'],
+                                          exclude='subdir/*'))
+
+        # prune
+        self.assertCountEqual([tmpdir / 'index.rst',
+                               tmpdir / 'subdir/doc.rst',
+                               tmpdir / 'subdir/images/a.png'],
+                              tmpdir.walk(prune='_build'))
+        self.assertCountEqual([tmpdir / 'index.rst',
+                               tmpdir / 'subdir/doc.rst'],
+                              tmpdir.walk(prune=['_build', 'subdir/images']))
+
+        # dirs
+        self.assertCountEqual([tmpdir / 'subdir',
+                               tmpdir / 'subdir/images',
+                               tmpdir / 'subdir/_build'],
+                              tmpdir.walk(prune='_build', exclude='*.*',
+                                          dirs=True))
+
+    @with_tmpdir
+    def test_glob(self, tmpdir):
+        tmpdir = path(tmpdir)
+        (tmpdir / 'subdir' / '_build').makedirs()
+        for name in ('index.rst', 'index.txt', 'subdir/doc.rst',
+                     'subdir/_build/doc.rst'):
+            (tmpdir / name).write_text('')
+
+        self.assertEqual([tmpdir / 'index.rst'], list(tmpdir.glob('*.rst')))
+        self.assertCountEqual([tmpdir / 'index.rst', tmpdir / 'index.txt'],
+                              tmpdir.glob('index.*'))
+        self.assertCountEqual([tmpdir / 'index.rst',
+                               tmpdir / 'subdir/doc.rst',
+                               tmpdir / 'subdir/_build/doc.rst'],
+                              tmpdir.rglob('*.rst'))
+        self.assertCountEqual([tmpdir / 'index.rst',
+                               tmpdir / 'subdir/doc.rst'],
+                              tmpdir.rglob('*.rst', prune='_build'))
+        self.assertEqual([tmpdir / 'subdir'], list(tmpdir.rglob('sub*')))
+
     @with_tmpdir
     def test_write_text(self, tmpdir):
         filename = "%s/test.file" % tmpdir
@@ -226,6 +410,58 @@ class TestPath(unittest.TestCase):
 
         self.assertEqual(b'hello world', path(filename).read_bytes())
 
+    @with_tmpdir
+    def test_read_bytes_view(self, tmpdir):
+        filename = path(tmpdir) / 'test.file'
+        filename.write_bytes(b'hello world')
+        self.assertEqual(b'hello world', filename.read_bytes(view=True))
+
+        # large file
+        content = b'x' * MMAP_THRESHOLD + b'hello world'
+        filename.write_bytes(content)
+        view = filename.read_bytes(view=True)
+        try:
+            self.assertIsInstance(view, mmap.mmap)
+            self.assertEqual(len(content), len(view))
+            self.assertEqual(MMAP_THRESHOLD, view.find(b'hello'))
+            self.assertIsNotNone(re.search(b'hello w[a-z]+', view))
+        finally:
+            view.close()
+
+    @with_tmpdir
+    def test_iter_bytes(self, tmpdir):
+        filename = path(tmpdir) / 'test.file'
+        filename.write_bytes(b'hello world')
+        self.assertEqual([b'hello', b' worl', b'd'],
+                         list(filename.iter_bytes(chunk_size=5)))
+
+        filename.write_bytes(b'')
+        self.assertEqual([], list(filename.iter_bytes()))
+
+    @with_tmpdir
+    def test_iter_lines(self, tmpdir):
+        filename = path(tmpdir) / 'test.file'
+        filename.write_text(u'hello\nw\u00f6rld\n', encoding='utf-8')
+        self.assertEqual([u'hello\n', u'w\u00f6rld\n'],
+                         list(filename.iter_lines(encoding='utf-8')))
+
+    @with_tmpdir
+    def test_write_iter(self, tmpdir):
+        filename = path(tmpdir) / 'test.file'
+        filename.write_iter(b'chunk%d ' % i for i in range(3))
+        self.assertEqual(b'chunk0 chunk1 chunk2 ', filename.read_bytes())
+
+        filename.write_iter([b'!'], append=True)
+        self.assertEqual(b'chunk0 chunk1 chunk2 !', filename.read_bytes())
+
+        filename.write_iter(iter([u'hello ', u'w\u00f6rld']),
+                            encoding='utf-8')
+        self.assertEqual(u'hello w\u00f6rld'.encode('utf-8'),
+                         filename.read_bytes())
+
+        filename.write_iter([])
+        self.assertEqual(b'', filename.read_bytes())
+
     @with_tmpdir
     def test_exists(self, tmpdir):
         subdir = "%s/subdir" % tmpdir
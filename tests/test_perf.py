@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import unittest
+from unittest.mock import patch
+from sphinx_testing import with_tmpdir
+from sphinx_testing.path import path
+from sphinx_testing.perf import (
+    PerfBaseline, PerfRegression, get_perf_baseline, peak_rss
+)
+from sphinx_testing.util import with_app
+
+
+def record(filename, name):
+    PerfBaseline(filename).check(name, [(1.0, 100)], '/path/to/root', 'html',
+                                 {})
+
+
+class TestPerfBaseline(unittest.TestCase):
+    def test_peak_rss(self):
+        self.assertGreater(peak_rss(), 0)
+
+    @with_tmpdir
+    def test_check(self, tmpdir):
+        baseline = PerfBaseline(tmpdir / 'perf.json', tolerance=0.5)
+        baseline.check('test1', [(1.0, 100), (0.8, 120)], '/path/to/root',
+                       'html', {'language': 'ja'})
+        with open(tmpdir / 'perf.json') as f:
+            recorded = json.load(f)['test1']
+        self.assertEqual(0.8, recorded['build_time'])
+        self.assertEqual(100, recorded['peak_rss'])
+        self.assertIn('test1: recorded', baseline.report())
+
+        # within tolerance
+        baseline.check('test1', [(1.1, 140)], '/path/to/root', 'html', {})
+        self.assertIn('test1: ok', baseline.report())
+
+        # small growth of RSS is ignored as noise
+        baseline.check('test1', [(0.8, 512 * 1024)], '/path/to/root', 'html',
+                       {})
+        self.assertIn('test1: ok', baseline.report())
+        with self.assertRaises(PerfRegression) as cm:
+            baseline.check('test1', [(0.8, 2 * 1024 * 1024)], '/path/to/root',
+                           'html', {})
+        self.assertIn('peak_rss', str(cm.exception).splitlines()[-1])
+
+        # regression
+        with self.assertRaises(PerfRegression) as cm:
+            baseline.check('test1', [(1.3, 100)], '/path/to/root', 'html',
+                           {'language': 'ja'})
+        report = str(cm.exception)
+        self.assertIn('test1: REGRESSION', report)
+        self.assertIn('srcdir: /path/to/root', report)
+        self.assertIn('buildername: html', report)
+        self.assertIn("confoverrides: {'language': 'ja'}", report)
+        self.assertIn('build_time: 1.3s (baseline: 0.8s, +62.5%) !', report)
+
+        # not built
+        baseline.check('test2', [], '/path/to/root', 'html', {})
+        self.assertNotIn('test2', baseline.load())
+
+        # update
+        baseline.update = True
+        baseline.check('test1', [(1.3, 100)], '/path/to/root', 'html', {})
+        self.assertEqual(1.3, baseline.load()['test1']['build_time'])
+
+    @with_tmpdir
+    def test_check_concurrently(self, tmpdir):
+        from concurrent.futures import ProcessPoolExecutor
+
+        filename = tmpdir / 'perf.json'
+        names = ['test%d' % i for i in range(16)]
+        with ProcessPoolExecutor(4) as executor:
+            list(executor.map(record, [filename] * len(names), names))
+        self.assertCountEqual(names, PerfBaseline(filename).load())
+
+    def test_get_perf_baseline(self):
+        self.assertIsNone(get_perf_baseline(False))
+        self.assertIsInstance(get_perf_baseline('perf.json'), PerfBaseline)
+
+        with patch.dict(os.environ, SPHINX_TESTING_PERF_BASELINE='perf.json',
+                        SPHINX_TESTING_PERF_TOLERANCE='0.1',
+                        SPHINX_TESTING_PERF_REPEAT='3'):
+            baseline = get_perf_baseline(None)
+            self.assertEqual('perf.json', baseline.filename)
+            self.assertEqual(0.1, baseline.tolerance)
+            self.assertEqual(3, baseline.repeat)
+            self.assertIs(baseline, get_perf_baseline(None))
+
+    @with_tmpdir
+    def test_with_app(self, tmpdir):
+        srcdir = path(__file__).dirname() / 'examples'
+        baseline = PerfBaseline(tmpdir / 'perf.json', repeat=2)
+        calls = []
+
+        @with_app(srcdir=srcdir, buildername='text', perf_baseline=baseline)
+        def execute(app, status, warning):
+            calls.append(app)
+            app.build()
+
+        execute()
+        self.assertEqual(2, len(calls))
+        name = '%s.%s' % (__name__, execute.__qualname__)
+        recorded = baseline.load()[name]
+        self.assertEqual(srcdir, recorded['srcdir'])
+        self.assertEqual('text', recorded['buildername'])
+        self.assertGreater(recorded['build_time'], 0)
+        self.assertGreaterEqual(recorded['peak_rss'], 0)
+
+        # the tests having the same name in other modules are not mixed
+        def other(app, status, warning):
+            app.build()
+        other.__module__ = 'other_module'
+        other.__qualname__ = execute.__qualname__
+        with_app(srcdir=srcdir, buildername='text',
+                 perf_baseline=baseline)(other)()
+        self.assertEqual(2, len(baseline.load()))
+
+        # the baseline is very fast
+        recorded['build_time'] = 0.000001
+        baseline.save({name: recorded})
+        with self.assertRaises(PerfRegression):
+            execute()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from sphinx_testing.path import path
+from sphinx_testing.pool import AppPool
+from sphinx_testing.util import with_app
+
+
+class TestAppPool(unittest.TestCase):
+    def setUp(self):
+        self.srcdir = path(__file__).dirname() / 'examples'
+        self.pool = AppPool(maxsize=2)
+
+    def tearDown(self):
+        self.pool.clear()
+
+    def test_make_key(self):
+        key1 = AppPool.make_key(srcdir=self.srcdir,
+                                confoverrides={'a': 1, 'b': 2})
+        key2 = AppPool.make_key(self.srcdir, confoverrides={'b': 2, 'a': 1})
+        self.assertEqual(key1, key2)
+
+        key3 = AppPool.make_key(srcdir=self.srcdir, buildername='text')
+        self.assertNotEqual(key1, key3)
+
+        with self.assertRaises(AssertionError):
+            AppPool.make_key(srcdir=self.srcdir, status=None)
+
+    def test_acquire_and_release(self):
+        app = self.pool.acquire(srcdir=self.srcdir)
+        app.build()
+        self.assertIn('index.html', os.listdir(app.outdir))
+        self.assertIn('build succeeded', app._status.getvalue())
+        self.pool.release(app)
+        self.assertEqual(1, len(self.pool._apps))
+
+        # reused app has been reset
+        app2 = self.pool.acquire(srcdir=self.srcdir)
+        self.assertIs(app, app2)
+        self.assertEqual('', app2._status.getvalue())
+        self.assertEqual([], os.listdir(app2.outdir))
+
+        app2.build()
+        self.assertIn('index.html', os.listdir(app2.outdir))
+        self.pool.release(app2)
+
+        # apps in use are not shared
+        app3 = self.pool.acquire(srcdir=self.srcdir)
+        app4 = self.pool.acquire(srcdir=self.srcdir)
+        self.assertIsNot(app3, app4)
+        self.pool.release(app3)
+        self.pool.release(app4)
+
+    def test_release_with_error(self):
+        app = self.pool.acquire(srcdir=self.srcdir)
+        self.pool.release(app, error=Exception())
+        self.assertEqual(0, len(self.pool._apps))
+        self.assertFalse(app.builddir.exists())
+
+    def test_eviction(self):
+        apps = [self.pool.acquire(srcdir=self.srcdir, buildername=name)
+                for name in ('html', 'text', 'xml')]
+        for app in apps:
+            self.pool.release(app)
+
+        # least recently used app is evicted
+        self.assertEqual(2, len(self.pool._apps))
+        self.assertFalse(apps[0].builddir.exists())
+        self.assertTrue(apps[1].builddir.exists())
+        self.assertTrue(apps[2].builddir.exists())
+
+    def test_with_app_reuse(self):
+        apps = []
+
+        @with_app(srcdir=self.srcdir, reuse=self.pool)
+        def execute(app, status, warning):
+            apps.append(app)
+            app.build()
+            self.assertIs(app._status, status)
+            self.assertEqual(1, status.getvalue().count('build succeeded'))
+
+        execute()
+        execute()
+        self.assertIs(apps[0], apps[1])
+        self.assertTrue(apps[0].builddir.exists())
+
+    def test_with_app_reuse_restores_state(self):
+        reads = []
+
+        @with_app(srcdir=self.srcdir, reuse=self.pool)
+        def modify(app, status, warning):
+            app.connect('source-read', lambda *args: reads.append(args[1]))
+            app.config.html_title = 'Modified title'
+            app.build()
+
+        @with_app(srcdir=self.srcdir, reuse=self.pool)
+        def execute(app, status, warning):
+            app.build()
+            html = (app.outdir / 'index.html').read_bytes()
+            self.assertNotIn(b'Modified title', html)
+
+        modify()
+        self.assertEqual(['index'], reads)
+        execute()
+        self.assertEqual(['index'], reads)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+from sphinx_testing import with_tmpdir
+from sphinx_testing.path import path
+from sphinx_testing.profiling import EventProfile
+from sphinx_testing.util import TestApp, docutils_namespace
+
+
+def handler(app, *args):
+    return 'result'
+
+
+class TestEventProfile(unittest.TestCase):
+    def test_wrap(self):
+        profile = EventProfile()
+        wrapped = profile.wrap('doctree-read', handler)
+        self.assertEqual('handler', wrapped.__name__)
+        self.assertEqual(__name__, wrapped.__module__)
+        self.assertEqual('result', wrapped(None, 'arg'))
+        self.assertEqual('result', wrapped(None, 'arg'))
+        profile.wrap('env-updated', handler)(None)
+
+        self.assertEqual(2, profile.records[('doctree-read', __name__)][0])
+        self.assertEqual({'doctree-read': 2, 'env-updated': 1},
+                         {event: calls for event, (calls, _)
+                          in profile.by_event().items()})
+        self.assertEqual(3, profile.by_module()[__name__][0])
+        self.assertIn('doctree-read', profile.report())
+
+        profile.clear()
+        self.assertEqual(0, profile.records[('doctree-read', __name__)][0])
+
+    @with_tmpdir
+    def test_TestApp(self, tmpdir):
+        srcdir = path(__file__).dirname() / 'examples'
+        with docutils_namespace():
+            app = TestApp(srcdir=srcdir, profile_events=True)
+            try:
+                app.connect('doctree-read', handler)
+                app.build()
+            finally:
+                app.cleanup()
+
+        profile = app.event_profile
+        self.assertEqual(1, profile.records[('doctree-read', __name__)][0])
+        self.assertIn('builder-inited', profile.by_event())
+        self.assertIn('sphinx.builders.html', profile.by_module())
+
+        profile.export(tmpdir / 'events.json', test='test_TestApp')
+        with open(tmpdir / 'events.json') as f:
+            exported = json.load(f)
+        self.assertEqual('test_TestApp', exported['test'])
+        self.assertIn({'event': 'doctree-read', 'module': __name__,
+                       'calls': 1,
+                       'time': profile.records[('doctree-read',
+                                                __name__)][1]},
+                      exported['handlers'])
+
+    def test_TestApp_without_profiling(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        with docutils_namespace():
+            app = TestApp(srcdir=srcdir)
+            app.cleanup()
+        self.assertIsNone(app.event_profile)
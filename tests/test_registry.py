@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import unittest
+from docutils import nodes
+from docutils.parsers.rst import Directive, directives
+from sphinx_testing import with_tmpdir
+from sphinx_testing.registry import (
+    register_global, register_node, registry_namespace, restore_registries,
+    save_registries, unregister_registry
+)
+from sphinx_testing.util import TestApp
+
+
+class custom_node(nodes.Element):
+    pass
+
+
+class CustomDirective(Directive):
+    pass
+
+
+class TestRegistry(unittest.TestCase):
+    def test_register_global(self):
+        cache = {'key': 'value'}
+        register_global('test.cache', cache)
+        try:
+            state = save_registries()
+            cache['key2'] = 'value2'
+            restore_registries(state)
+            self.assertEqual({'key': 'value'}, cache)
+
+            # restored only the given registries
+            cache['key2'] = 'value2'
+            restore_registries(state, names=('docutils.',))
+            self.assertEqual({'key': 'value', 'key2': 'value2'}, cache)
+        finally:
+            unregister_registry('test.cache')
+
+        self.assertNotIn('test.cache', save_registries())
+
+    def test_docutils_components(self):
+        with registry_namespace():
+            directives.register_directive('custom-directive',
+                                          CustomDirective)
+            register_node(custom_node)
+            self.assertTrue(hasattr(nodes.GenericNodeVisitor,
+                                    'visit_custom_node'))
+
+        self.assertNotIn('custom-directive', directives._directives)
+        self.assertFalse(hasattr(nodes.GenericNodeVisitor,
+                                 'visit_custom_node'))
+
+    @with_tmpdir
+    def test_TestApp(self, tmpdir):
+        (tmpdir / 'conf.py').write_text("import sys\n"
+                                        "sys.path.insert(0, '/unknown')\n")
+        (tmpdir / 'index.rst').write_text('')
+        app = TestApp(srcdir=tmpdir)
+        try:
+            self.assertIn('/unknown', sys.path)
+        finally:
+            app.cleanup()
+
+        self.assertNotIn('/unknown', sys.path)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from sphinx_testing import with_tmpdir
+from sphinx_testing.path import path
+from sphinx_testing.snapshot import TreeDiff, TreeSnapshot
+from sphinx_testing.util import with_app
+
+
+class TestTreeSnapshot(unittest.TestCase):
+    @with_tmpdir
+    def test_take(self, tmpdir):
+        (tmpdir / 'subdir' / '_build').makedirs()
+        (tmpdir / 'index.html').write_bytes(b'hello')
+        (tmpdir / 'subdir' / 'page.html').write_bytes(b'world')
+        (tmpdir / 'subdir' / '_build' / 'page.html').write_bytes(b'')
+
+        snapshot = TreeSnapshot.take(tmpdir)
+        self.assertEqual(3, len(snapshot))
+        self.assertIn('index.html', snapshot)
+        self.assertIn('subdir/page.html', snapshot)
+        self.assertEqual(5, snapshot.entries['index.html'][0])
+
+        snapshot = TreeSnapshot.take(tmpdir, prune='_build')
+        self.assertCountEqual(['index.html', 'subdir/page.html'], snapshot)
+
+    @with_tmpdir
+    def test_diff(self, tmpdir):
+        for name in ('added', 'removed', 'modified', 'untouched',
+                     'rewritten'):
+            (tmpdir / name).write_bytes(name.encode())
+        os.utime(tmpdir / 'modified', (0, 0))
+        os.utime(tmpdir / 'rewritten', (0, 0))
+        (tmpdir / 'added').unlink()
+
+        before = TreeSnapshot.take(tmpdir)
+        self.assertEqual(40, len(before.digest('rewritten')))
+        (tmpdir / 'added').write_bytes(b'added')
+        (tmpdir / 'removed').unlink()
+        (tmpdir / 'modified').write_bytes(b'changed')
+        (tmpdir / 'rewritten').write_bytes(b'rewritten')
+        after = TreeSnapshot.take(tmpdir)
+
+        diff = before.diff(after)
+        self.assertIsInstance(diff, TreeDiff)
+        self.assertEqual({'added'}, diff.added)
+        self.assertEqual({'removed'}, diff.removed)
+        self.assertEqual({'modified', 'rewritten'}, diff.modified)
+        self.assertEqual({'untouched'}, diff.untouched)
+        self.assertEqual({'added', 'modified', 'rewritten'}, diff.changed)
+
+        diff = before.diff(after, compare_content=True)
+        self.assertEqual({'modified'}, diff.modified)
+        self.assertEqual({'untouched', 'rewritten'}, diff.untouched)
+
+    def test_TestApp_snapshot(self):
+        srcdir = path(__file__).dirname() / 'examples'
+
+        @with_app(srcdir=srcdir, copy_srcdir_to_tmpdir=True,
+                  buildername='text')
+        def execute(app, status, warning):
+            before = app.snapshot()
+            self.assertEqual(0, len(before))
+
+            app.build()
+            built = app.snapshot()
+            self.assertEqual({'index.txt'}, before.diff(built).added)
+
+            app.build()
+            self.assertEqual({'index.txt'},
+                             built.diff(app.snapshot()).untouched)
+
+            (app.srcdir / 'index.rst').write_text('Hello world\n')
+            app.build()
+            self.assertEqual({'index.txt'},
+                             built.diff(app.snapshot()).modified)
+
+        execute()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from unittest.mock import patch
+from sphinx_testing import with_tmpdir
+from sphinx_testing.path import path
+from sphinx_testing.spec import (
+    TreeCache, flatten_spec, get_tree_cache, spec_digest
+)
+from sphinx_testing.util import TestApp, with_app
+
+
+class TestTreeSpec(unittest.TestCase):
+    def test_flatten_spec(self):
+        files = flatten_spec({'index.rst': 'Hello world',
+                              'sub': {'doc.rst': b'\x00',
+                                      'subsub/doc.rst': ''}})
+        self.assertEqual({'conf.py': b'',
+                          'index.rst': b'Hello world',
+                          'sub/doc.rst': b'\x00',
+                          'sub/subsub/doc.rst': b''}, files)
+
+        files = flatten_spec({'conf.py': {'project': 'Sphinx',
+                                          'extensions': ['sphinx.ext.todo']}})
+        self.assertEqual({'conf.py': (b"extensions = ['sphinx.ext.todo']\n"
+                                      b"project = 'Sphinx'\n")}, files)
+
+    def test_spec_digest(self):
+        digest = spec_digest(flatten_spec({'index.rst': 'Hello world'}))
+        self.assertEqual(digest,
+                         spec_digest(flatten_spec({'index.rst': 'Hello world',
+                                                   'conf.py': ''})))
+        self.assertNotEqual(digest,
+                            spec_digest(flatten_spec({'index.rst': 'Hello'})))
+        self.assertNotEqual(digest,
+                            spec_digest(flatten_spec({'index.txt':
+                                                      'Hello world'})))
+
+    @with_tmpdir
+    def test_materialize(self, tmpdir):
+        cache = TreeCache(tmpdir / 'cache')
+        spec = {'index.rst': 'Hello world', 'sub': {'doc.rst': ''}}
+        cache.materialize(spec, tmpdir / 'root1')
+        cache.materialize(spec, tmpdir / 'root2')
+        self.assertEqual(1, len(os.listdir(tmpdir / 'cache')))
+        self.assertCountEqual(['conf.py', 'index.rst', 'sub'],
+                              os.listdir(tmpdir / 'root2'))
+        self.assertEqual(b'Hello world',
+                         (tmpdir / 'root2' / 'index.rst').read_bytes())
+
+        # writing to the materialized tree does not affect the cache
+        (tmpdir / 'root1' / 'index.rst').write_text('Goodbye')
+        cache.materialize(spec, tmpdir / 'root3')
+        self.assertEqual(b'Hello world',
+                         (tmpdir / 'root3' / 'index.rst').read_bytes())
+
+        # the cached tree modified by other means is rewritten
+        with open(tmpdir / 'root2' / 'index.rst', 'a') as f:
+            f.write('!')
+        cache.materialize(spec, tmpdir / 'root4')
+        self.assertEqual(b'Hello world',
+                         (tmpdir / 'root4' / 'index.rst').read_bytes())
+
+        cache.clear()
+        self.assertFalse((tmpdir / 'cache').exists())
+
+    @with_tmpdir
+    def test_evict(self, tmpdir):
+        cache = TreeCache(tmpdir / 'cache', maxsize=25)
+        root1 = cache.lookup(flatten_spec({'index.rst': 'a' * 10}))
+        root2 = cache.lookup(flatten_spec({'index.rst': 'b' * 10}))
+        self.assertEqual(2, len(os.listdir(tmpdir / 'cache')))
+
+        # the least recently used tree is removed
+        os.utime(root2.dirname(), (0, 0))
+        cache.lookup(flatten_spec({'index.rst': 'a' * 10}))  # used
+        root3 = cache.lookup(flatten_spec({'index.rst': 'c' * 10}))
+        self.assertTrue(root1.exists())
+        self.assertFalse(root2.exists())
+        self.assertTrue(root3.exists())
+
+        # the tree just stored is kept even if it is too large
+        cache.maxsize = 0
+        root4 = cache.lookup(flatten_spec({'index.rst': 'd' * 10}))
+        self.assertEqual([root4.dirname().basename()],
+                         os.listdir(tmpdir / 'cache'))
+
+    @with_tmpdir
+    def test_get_tree_cache(self, tmpdir):
+        self.assertIsNone(get_tree_cache(False))
+        with patch.dict(os.environ, SPHINX_TESTING_TREE_CACHE=tmpdir):
+            self.assertEqual(tmpdir, get_tree_cache(None).cachedir)
+
+            # not writable
+            with patch('os.access', return_value=False):
+                self.assertIsNone(get_tree_cache(None))
+
+    @with_tmpdir
+    def test_TestApp_with_tree_cache(self, tmpdir):
+        spec = {'index.rst': 'Hello world\n'}
+        cache = TreeCache(tmpdir / 'cache')
+        try:
+            app = TestApp(create_new_srcdir=spec, tree_cache=cache)
+            self.assertEqual(1, len(os.listdir(tmpdir / 'cache')))
+        finally:
+            app.cleanup()
+
+        with patch.dict(os.environ, SPHINX_TESTING_TREE_CACHE=tmpdir / 'x'):
+            try:
+                app = TestApp(create_new_srcdir=spec, tree_cache=False)
+                self.assertEqual(b'Hello world\n',
+                                 (app.srcdir / 'index.rst').read_bytes())
+                self.assertFalse((tmpdir / 'x').exists())
+            finally:
+                app.cleanup()
+
+    @with_tmpdir
+    def test_TestApp(self, tmpdir):
+        spec = {'conf.py': {'master_doc': 'contents'},
+                'contents.rst': 'Hello world\n'}
+        with patch.dict(os.environ, SPHINX_TESTING_TREE_CACHE=tmpdir):
+            app = TestApp(create_new_srcdir=spec)
+        try:
+            self.assertEqual('contents', app.config.master_doc)
+            app.build()
+            self.assertIn('contents.html', os.listdir(app.outdir))
+        finally:
+            app.cleanup()
+
+    @with_tmpdir
+    def test_with_app(self, tmpdir):
+        spec = {'index.rst': 'Hello world\n'}
+
+        @with_app(create_new_srcdir=spec, buildername='text')
+        def execute(app, status, warning):
+            app.build()
+            text = (path(app.outdir) / 'index.txt').read_bytes()
+            self.assertIn(b'Hello world', text)
+
+        with patch.dict(os.environ, SPHINX_TESTING_TREE_CACHE=tmpdir):
+            execute()
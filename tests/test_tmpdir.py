@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import os
 import shutil
 import unittest
+from unittest.mock import patch
 from sphinx_testing.path import path
-from sphinx_testing.tmpdir import mkdtemp, with_tmpdir
+from sphinx_testing.tmpdir import (
+    TmpdirPool, disable_pool, drain, enable_pool, get_pool, memory_tmpdir,
+    mkdtemp, rmtree, tree_size, with_tmpdir
+)
 
 
 class TestTmpdir(unittest.TestCase):
@@ -36,6 +41,37 @@ class TestTmpdir(unittest.TestCase):
         finally:
             parent.rmtree()
 
+        # memory option
+        try:
+            parent = mkdtemp()
+            with patch.dict(os.environ, SPHINX_TESTING_MEMORY_TMPDIR=parent):
+                tmpdir = mkdtemp(memory=True)
+                self.assertEqual(parent, tmpdir.dirname())
+
+                tmpdir = mkdtemp(memory=True, size_hint=2 ** 40)
+                self.assertNotEqual(parent, tmpdir.dirname())
+                tmpdir.rmtree()
+        finally:
+            parent.rmtree()
+
+    @with_tmpdir
+    def test_memory_tmpdir(self, tmpdir):
+        with patch.dict(os.environ, SPHINX_TESTING_MEMORY_TMPDIR=tmpdir):
+            self.assertEqual(tmpdir, memory_tmpdir())
+            self.assertEqual(tmpdir, memory_tmpdir(size_hint=1024))
+            self.assertIsNone(memory_tmpdir(size_hint=1024, threshold=100))
+
+        unknown = tmpdir / 'unknown'
+        with patch.dict(os.environ, SPHINX_TESTING_MEMORY_TMPDIR=unknown):
+            self.assertIsNone(memory_tmpdir())
+
+    @with_tmpdir
+    def test_tree_size(self, tmpdir):
+        (tmpdir / 'subdir').makedirs()
+        (tmpdir / 'file1').write_bytes(b'hello')
+        (tmpdir / 'subdir' / 'file2').write_bytes(b'world!')
+        self.assertEqual(11, tree_size(tmpdir))
+
     def test_with_tmpdir(self):
         @with_tmpdir
         def testcase1(tmpdir):
@@ -55,3 +91,142 @@ class TestTmpdir(unittest.TestCase):
         except Exception as exc:
             tmpdir = exc.args[0]
             self.assertFalse(tmpdir.isdir())
+
+    def test_with_tmpdir_deferred(self):
+        @with_tmpdir(deferred=True)
+        def testcase(tmpdir):
+            self.assertTrue(tmpdir.isdir())
+            (tmpdir / 'subdir').makedirs()
+            return tmpdir
+
+        tmpdir = testcase()
+        self.assertFalse(tmpdir.isdir())
+        drain()
+        trashes = [name for name in tmpdir.dirname().listdir()
+                   if name.startswith('.trash-')]
+        self.assertEqual([], trashes)
+
+    def test_rmtree(self):
+        try:
+            parent = mkdtemp()
+
+            tmpdir = mkdtemp(dir=parent)
+            (tmpdir / 'subdir').makedirs()
+            rmtree(tmpdir)
+            self.assertEqual([], parent.listdir())
+
+            # deferred
+            tmpdir = mkdtemp(dir=parent)
+            (tmpdir / 'subdir').makedirs()
+            rmtree(tmpdir, deferred=True)
+            self.assertFalse(tmpdir.exists())
+            drain()
+            self.assertEqual([], parent.listdir())
+
+            # not exists
+            rmtree(parent / 'unknown', deferred=True)
+        finally:
+            parent.rmtree()
+
+
+class TestTmpdirPool(unittest.TestCase):
+    def tearDown(self):
+        disable_pool()
+
+    def test_acquire_and_release(self):
+        pool = TmpdirPool(size=2)
+        try:
+            tmpdir1 = pool.acquire(skeleton=('doctrees', 'html'))
+            self.assertCountEqual(['doctrees', 'html'], tmpdir1.listdir())
+            drain()  # wait for prewarming
+            parent = tmpdir1.dirname()
+            self.assertEqual(3, len(parent.listdir()))
+
+            tmpdir2 = pool.acquire(skeleton=('doctrees', 'html'))
+            self.assertEqual(parent, tmpdir2.dirname())
+            drain()
+            self.assertEqual(3, len(parent.listdir()))  # 2 leased + 1 ready
+
+            (tmpdir1 / 'html' / 'index.html').write_text('')
+            self.assertTrue(pool.release(tmpdir1))
+            self.assertFalse(tmpdir1.exists())
+            self.assertFalse(pool.release(tmpdir1))
+            drain()
+            ready = pool._ready[(None, ('doctrees', 'html'))]
+            self.assertEqual(2, len(ready))
+            for tmpdir in ready:
+                self.assertCountEqual(['doctrees', 'html'], tmpdir.listdir())
+            self.assertEqual(3, len(parent.listdir()))
+        finally:
+            pool.clear()
+
+        self.assertFalse(parent.exists())
+
+    def test_mkdtemp(self):
+        pool = enable_pool(size=1)
+        self.assertIs(pool, get_pool())
+
+        tmpdir = mkdtemp(skeleton=('doctrees',))
+        self.assertTrue((tmpdir / 'doctrees').isdir())
+        self.assertTrue(tmpdir.dirname().basename().startswith('sphinx-'))
+        rmtree(tmpdir)
+        self.assertFalse(tmpdir.exists())
+
+        # not taken from the pool if options are given
+        parent = mkdtemp(prefix='sphinx')
+        try:
+            self.assertTrue(parent.basename().startswith('sphinx'))
+            tmpdir = mkdtemp(dir=parent)
+            self.assertEqual(parent, tmpdir.dirname())
+        finally:
+            rmtree(parent)
+
+        disable_pool()
+        self.assertIsNone(get_pool())
+        self.assertFalse(tmpdir.dirname().exists())
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'fork is not available')
+    def test_fork(self):
+        pool = enable_pool(size=2)
+        tmpdir = mkdtemp()
+        drain()  # wait for prewarming
+        ready = list(pool._ready[(None, ())])
+        rmtree(tmpdir)
+
+        rfd, wfd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                tmpdir = mkdtemp()
+                rmtree(tmpdir, deferred=True)
+                drain()
+                result = '%s %s %s' % (get_pool(), tmpdir, tmpdir.exists())
+                os.write(wfd, result.encode())
+            finally:
+                os._exit(0)
+
+        os.close(wfd)
+        os.waitpid(pid, 0)
+        with os.fdopen(rfd) as f:
+            child_pool, child_tmpdir, exists = f.read().split()
+        self.assertEqual('None', child_pool)
+        self.assertNotIn(child_tmpdir, ready)
+        self.assertNotEqual(tmpdir.dirname(), path(child_tmpdir).dirname())
+        self.assertEqual('False', exists)
+        self.assertIs(pool, get_pool())
+
+    def test_enabled_by_environ(self):
+        with patch.dict(os.environ, SPHINX_TESTING_TMPDIR_POOL='2'):
+            pool = get_pool()
+        self.assertEqual(2, pool.size)
+
+    def test_with_tmpdir(self):
+        enable_pool(size=1)
+
+        @with_tmpdir
+        def testcase(tmpdir):
+            self.assertTrue(tmpdir.isdir())
+            return tmpdir
+
+        tmpdir = testcase()
+        self.assertFalse(tmpdir.isdir())
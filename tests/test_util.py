@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 
 import os
+import json
 import sphinx
 import unittest
 from io import StringIO
 from unittest.mock import patch
-from sphinx_testing.path import path
-from sphinx_testing.tmpdir import mkdtemp
-from sphinx_testing.util import TestApp, with_app
+from sphinx_testing.path import path, _cow_roots
+from sphinx_testing.tmpdir import disable_pool, drain, enable_pool, mkdtemp
+from sphinx_testing.util import (
+    TestApp, auto_parallel, available_cpus, with_app
+)
 
 
 class TestSphinxTesting(unittest.TestCase):
@@ -80,6 +83,250 @@ class TestSphinxTesting(unittest.TestCase):
         self.assertFalse(app.srcdir.exists())
         self.assertFalse(app.builddir.exists())
 
+    def test_TestApp_when_copy_srcdir_to_tmpdir_is_clone(self):
+        try:
+            srcdir = path(__file__).dirname() / 'examples'
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir='clone')
+            self.assertNotEqual(srcdir, app.srcdir)
+            self.assertEqual(app.srcdir, app.builddir.dirname())
+            self.assertCountEqual(['_build', 'conf.py', 'index.rst'],
+                                  os.listdir(app.srcdir))
+            self.assertEqual((srcdir / 'index.rst').read_bytes(),
+                             (app.srcdir / 'index.rst').read_bytes())
+
+            original = (srcdir / 'index.rst').read_bytes()
+            path(app.srcdir / 'index.rst').write_text('Hello world')
+            self.assertEqual(original, (srcdir / 'index.rst').read_bytes())
+            self.assertIn(str(app.srcdir), _cow_roots)
+        finally:
+            app.cleanup()
+
+        self.assertFalse(app.srcdir.exists())
+        self.assertNotIn(str(app.srcdir), _cow_roots)
+
+    def test_TestApp_when_copy_srcdir_to_tmpdir_is_clone_with_build(self):
+        tmpdir = mkdtemp()
+        try:
+            srcdir = tmpdir / 'root'
+            (path(__file__).dirname() / 'examples').copytree(srcdir)
+            (srcdir / '_build' / 'html').makedirs()
+            (srcdir / '_build' / 'html' / 'index.html').write_bytes(b'stale')
+
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir='clone')
+            try:
+                app.build()
+                html = (app.outdir / 'index.html').read_bytes()
+                self.assertIn(b'<html', html)
+            finally:
+                app.cleanup()
+
+            self.assertEqual(b'stale',
+                             (srcdir / '_build' / 'html' /
+                              'index.html').read_bytes())
+        finally:
+            tmpdir.rmtree()
+
+    def test_TestApp_when_copy_srcdir_to_tmpdir_is_overlay_with_build(self):
+        tmpdir = mkdtemp()
+        try:
+            srcdir = tmpdir / 'root'
+            (path(__file__).dirname() / 'examples').copytree(srcdir)
+            (srcdir / '_build' / 'html').makedirs()
+            (srcdir / '_build' / 'html' / 'index.html').write_bytes(b'stale')
+
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir='overlay')
+            try:
+                app.build()
+                html = (app.outdir / 'index.html').read_bytes()
+                self.assertIn(b'<html', html)
+            finally:
+                app.cleanup()
+
+            self.assertEqual(['index.html'],
+                             (srcdir / '_build' / 'html').listdir())
+            self.assertEqual(b'stale',
+                             (srcdir / '_build' / 'html' /
+                              'index.html').read_bytes())
+        finally:
+            tmpdir.rmtree()
+
+    def test_TestApp_when_copy_srcdir_to_tmpdir_is_overlay(self):
+        try:
+            srcdir = path(__file__).dirname() / 'examples'
+            app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir='overlay')
+            self.assertNotEqual(srcdir, app.srcdir)
+            self.assertEqual(app.srcdir, app.builddir.dirname())
+            self.assertCountEqual(['_build', 'conf.py', 'index.rst'],
+                                  os.listdir(app.srcdir))
+            self.assertTrue(os.path.islink(app.srcdir / 'index.rst'))
+
+            original = (srcdir / 'index.rst').read_bytes()
+            path(app.srcdir / 'index.rst').write_text('Hello world')
+            self.assertFalse(os.path.islink(app.srcdir / 'index.rst'))
+            self.assertEqual(original, (srcdir / 'index.rst').read_bytes())
+
+            app.build()
+            self.assertIn('index.html', os.listdir(app.outdir))
+        finally:
+            app.cleanup()
+
+        self.assertFalse(app.srcdir.exists())
+        self.assertEqual(original, (srcdir / 'index.rst').read_bytes())
+
+    def test_TestApp_build_for(self):
+        try:
+            app = TestApp(create_new_srcdir=True)
+            path(app.srcdir / 'index.rst').write_text(
+                'Hello world\n\n'
+                '.. only:: html\n\n   HTML only\n\n'
+                '.. only:: text\n\n   Text only\n')
+            outdirs = app.build_for(['html', 'text', 'man'])
+
+            self.assertEqual(['html', 'text', 'man'], list(outdirs))
+            self.assertEqual(app.outdir, outdirs['html'])
+            self.assertEqual(app.builddir / 'text', outdirs['text'])
+            self.assertEqual(1, app._status.getvalue().count('1 added'))
+
+            text = path(outdirs['text'] / 'index.txt').read_bytes()
+            self.assertIn(b'Text only', text)
+            self.assertNotIn(b'HTML only', text)
+            self.assertTrue(os.listdir(outdirs['man']))
+
+            # the builder of the app is restored
+            self.assertEqual('html', app.builder.name)
+            self.assertIn('html', app.tags)
+            self.assertNotIn('text', app.tags)
+        finally:
+            app.cleanup()
+
+    def test_TestApp_rebuild(self):
+        try:
+            app = TestApp(create_new_srcdir=True)
+            srcdir = path(app.srcdir)
+            (srcdir / 'index.rst').write_text(
+                '.. toctree::\n\n   doc1\n   doc2\n   sub/doc3\n')
+            (srcdir / 'doc1.rst').write_text('doc1\n====\n')
+            (srcdir / 'doc2.rst').write_text('doc2\n====\n')
+            (srcdir / 'sub').makedirs()
+            (srcdir / 'sub' / 'doc3.rst').write_text('doc3\n====\n')
+            app.build()
+
+            result = app.rebuild(changed=['doc1.rst'])
+            self.assertEqual({'doc1'}, result.reread)
+            self.assertIn('doc1.html', result.rewritten)
+            self.assertNotIn('doc2.html', result.rewritten)
+            self.assertGreater(result.elapsed, 0)
+
+            result = app.rebuild(changed={'sub/doc3.rst': 'DOC3\n====\n'},
+                                 added={'sub/doc4.rst': 'doc4\n====\n'})
+            self.assertEqual({'sub/doc3', 'sub/doc4'}, result.reread)
+            self.assertIn('sub/doc3.html', result.rewritten)
+            self.assertIn(b'DOC3', (app.outdir / 'sub/doc3.html').read_bytes())
+
+            result = app.rebuild(removed=['doc2.rst'])
+            self.assertEqual(set(), result.reread)
+            self.assertFalse((srcdir / 'doc2.rst').exists())
+
+            result = app.rebuild()
+            self.assertEqual(set(), result.reread)
+            self.assertNotIn('doc1.html', result.rewritten)
+            self.assertNotIn('sub/doc3.html', result.rewritten)
+        finally:
+            app.cleanup()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork()')
+    def test_TestApp_rebuild_in_parallel(self):
+        from sphinx_testing.generator import generate_spec
+
+        spec = generate_spec(documents=60, xrefs=0)
+        try:
+            app = TestApp(create_new_srcdir=spec, tree_cache=False,
+                          parallel=4)
+            app.build()
+            changed = ['doc%05d.rst' % i for i in range(10)]
+            result = app.rebuild(changed=changed)
+            self.assertEqual({'doc%05d' % i for i in range(10)},
+                             result.reread)
+        finally:
+            app.cleanup()
+
+    def test_available_cpus(self):
+        cpus = available_cpus()
+        self.assertGreaterEqual(cpus, 1)
+
+        with patch.dict(os.environ, PYTEST_XDIST_WORKER_COUNT='2'):
+            self.assertEqual(max(cpus // 2, 1), available_cpus())
+        with patch.dict(os.environ, PYTEST_XDIST_WORKER_COUNT='10000'):
+            self.assertEqual(1, available_cpus())
+
+    def test_auto_parallel(self):
+        try:
+            srcdir = mkdtemp()
+            for i in range(100):
+                (srcdir / ('doc%d.rst' % i)).write_text('')
+            (srcdir / 'conf.py').write_text('')
+
+            self.assertEqual(4, auto_parallel(srcdir, cpus=4))
+            self.assertEqual(5, auto_parallel(srcdir, cpus=16))
+            self.assertEqual(0, auto_parallel(srcdir, cpus=1))
+
+            examples = path(__file__).dirname() / 'examples'
+            self.assertEqual(0, auto_parallel(examples, cpus=16))
+        finally:
+            srcdir.rmtree()
+
+    def test_TestApp_when_parallel_is_auto(self):
+        try:
+            srcdir = path(__file__).dirname() / 'examples'
+            app = TestApp(srcdir=srcdir, parallel='auto')
+            self.assertEqual(0, app.parallel)
+            self.assertIn('parallel: auto (0 workers)',
+                          app._status.getvalue())
+        finally:
+            app.cleanup()
+
+    def test_TestApp_with_tmpdir_pool(self):
+        try:
+            enable_pool(size=1)
+            srcdir = path(__file__).dirname() / 'examples'
+            app = TestApp(srcdir=srcdir)
+            self.assertCountEqual(['doctrees', 'html'],
+                                  app.builddir.listdir())
+            app.build()
+            app.cleanup()
+            self.assertFalse(app.builddir.exists())
+        finally:
+            disable_pool()
+
+    def test_TestApp_when_memory(self):
+        try:
+            parent = mkdtemp()
+            srcdir = path(__file__).dirname() / 'examples'
+            with patch.dict(os.environ, SPHINX_TESTING_MEMORY_TMPDIR=parent):
+                app = TestApp(srcdir=srcdir, memory=True)
+            self.assertEqual(parent, app.builddir.dirname())
+            app.build()
+            self.assertIn('index.html', os.listdir(app.outdir))
+            app.cleanup()
+        finally:
+            parent.rmtree()
+
+    def test_TestApp_timings(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        app = TestApp(srcdir=srcdir, copy_srcdir_to_tmpdir=True)
+        app.build()
+
+        # timings are accumulated
+        build = app.timings['build']
+        app.build()
+        self.assertGreater(app.timings['build'], build)
+
+        app.cleanup()
+        self.assertEqual(['copy_srcdir', 'init', 'build', 'cleanup'],
+                         list(app.timings))
+        for elapsed in app.timings.values():
+            self.assertGreaterEqual(elapsed, 0)
+
     def test_TestApp_cleanup(self):
         app = TestApp(create_new_srcdir=True)
         self.assertTrue(app.builddir.exists())
@@ -93,6 +340,17 @@ class TestSphinxTesting(unittest.TestCase):
             app.cleanup()
             self.assertFalse(app.builddir.exists())
 
+    def test_TestApp_cleanup_when_deferred_cleanup(self):
+        app = TestApp(create_new_srcdir=True, deferred_cleanup=True)
+        self.assertTrue(app.builddir.exists())
+
+        app.cleanup()
+        self.assertFalse(app.builddir.exists())
+        drain()
+        trashes = [name for name in app.builddir.dirname().listdir()
+                   if name.startswith('.trash-')]
+        self.assertEqual([], trashes)
+
     def test_TestApp_cleanup_when_cleanup_on_errors(self):
         app = TestApp(create_new_srcdir=True, cleanup_on_errors=False)
         self.assertTrue(app.builddir.exists())
@@ -182,6 +440,35 @@ class TestSphinxTesting(unittest.TestCase):
 
         execute()
 
+    def test_with_app_write_docstring_with_clone(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        original = (srcdir / 'index.rst').read_bytes()
+
+        @with_app(srcdir=srcdir, copy_srcdir_to_tmpdir='clone',
+                  write_docstring=True)
+        def execute(app, status, warning):
+            """ Hello world """
+            content = (app.srcdir / 'index.rst').read_bytes()
+            self.assertEqual(b'Hello world ', content)
+
+        execute()
+        self.assertEqual(original, (srcdir / 'index.rst').read_bytes())
+
+    def test_with_app_write_docstring_with_overlay(self):
+        srcdir = path(__file__).dirname() / 'examples'
+        original = (srcdir / 'index.rst').read_bytes()
+
+        @with_app(srcdir=srcdir, copy_srcdir_to_tmpdir='overlay',
+                  write_docstring=True)
+        def execute(app, status, warning):
+            """ Hello world """
+            content = (app.srcdir / 'index.rst').read_bytes()
+            self.assertEqual(b'Hello world ', content)
+            self.assertTrue(os.path.islink(app.srcdir / 'conf.py'))
+
+        execute()
+        self.assertEqual(original, (srcdir / 'index.rst').read_bytes())
+
     def test_with_app_write_docstring_by_name(self):
         @with_app(create_new_srcdir=True, write_docstring='hello.rst')
         def execute(app, status, warning):
@@ -191,6 +478,56 @@ class TestSphinxTesting(unittest.TestCase):
 
         execute()
 
+    def test_with_app_timings_file(self):
+        try:
+            tmpdir = mkdtemp()
+            timings_file = tmpdir / 'timings.jsonl'
+
+            @with_app(create_new_srcdir=True, write_docstring=True,
+                      timings_file=timings_file)
+            def execute(app, status, warning):
+                """ Hello world """
+                app.build()
+
+            execute()
+            execute()
+            lines = timings_file.read_bytes().decode('utf-8').splitlines()
+            self.assertEqual(2, len(lines))
+
+            record = json.loads(lines[0])
+            self.assertIn('execute', record['test'])
+            self.assertEqual('html', record['buildername'])
+            self.assertEqual(['create_srcdir', 'copy_srcdir', 'init',
+                              'write_docstring', 'build', 'cleanup'],
+                             list(record['timings']))
+        finally:
+            tmpdir.rmtree()
+
+    def test_with_app_timings_file_with_reuse(self):
+        from sphinx_testing.pool import AppPool
+        pool = AppPool()
+        try:
+            tmpdir = mkdtemp()
+            timings_file = tmpdir / 'timings.jsonl'
+
+            @with_app(create_new_srcdir=True, write_docstring=True,
+                      reuse=pool, timings_file=timings_file)
+            def execute(app, status, warning):
+                """ Hello world """
+                app.build()
+
+            execute()
+            execute()
+            lines = timings_file.read_bytes().decode('utf-8').splitlines()
+            self.assertEqual(2, len(lines))
+
+            record = json.loads(lines[1])
+            self.assertIn('execute', record['test'])
+            self.assertIn('build', record['timings'])
+        finally:
+            pool.clear()
+            tmpdir.rmtree()
+
     def test_with_app_return_value(self):
         @with_app(create_new_srcdir=True)
         def execute(ret, app, status, warning):